@@ -0,0 +1,53 @@
+"""enforce a single open dialog per bot chat
+
+Revision ID: 0017_dialogs_open_chat_unique
+Revises: 0016_operator_mode_started
+Create Date: 2026-10-16 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0017_dialogs_open_chat_unique"
+down_revision = "0016_operator_mode_started"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    conn.execute(
+        sa.text(
+            """
+            UPDATE dialogs
+            SET closed = true
+            WHERE id IN (
+                SELECT id
+                FROM (
+                    SELECT
+                        id,
+                        row_number() OVER (
+                            PARTITION BY bot_id, channel_type, external_chat_id
+                            ORDER BY updated_at DESC, id DESC
+                        ) AS position
+                    FROM dialogs
+                    WHERE closed IS FALSE
+                ) ranked
+                WHERE ranked.position > 1
+            )
+            """
+        )
+    )
+    op.create_index(
+        "uq_dialogs_open_chat",
+        "dialogs",
+        ["bot_id", "channel_type", "external_chat_id"],
+        unique=True,
+        postgresql_where=sa.text("closed IS FALSE"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_dialogs_open_chat", table_name="dialogs")
@@ -0,0 +1,28 @@
+"""add dialog messages index for latest-message lookups
+
+Revision ID: 0018_dialog_messages_latest_idx
+Revises: 0017_dialogs_open_chat_unique
+Create Date: 2026-10-16 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0018_dialog_messages_latest_idx"
+down_revision = "0017_dialogs_open_chat_unique"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_dialog_messages_dialog_id_created_at_desc",
+        "dialog_messages",
+        ["dialog_id", sa.text("created_at DESC"), sa.text("id DESC")],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_dialog_messages_dialog_id_created_at_desc", table_name="dialog_messages")
@@ -0,0 +1,36 @@
+"""set dialogs.updated_at server default
+
+Revision ID: 0019_dialogs_updated_at_default
+Revises: 0018_dialog_messages_latest_idx
+Create Date: 2026-10-16 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0019_dialogs_updated_at_default"
+down_revision = "0018_dialog_messages_latest_idx"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        "dialogs",
+        "updated_at",
+        existing_type=sa.DateTime(),
+        existing_nullable=False,
+        server_default=sa.text("timezone('utc', now())"),
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        "dialogs",
+        "updated_at",
+        existing_type=sa.DateTime(),
+        existing_nullable=False,
+        server_default=None,
+    )
@@ -0,0 +1,39 @@
+"""add trigram indexes for dialog search
+
+Revision ID: 0020_dialog_search_trgm
+Revises: 0019_dialogs_updated_at_default
+Create Date: 2026-10-16 00:00:00.000000
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0020_dialog_search_trgm"
+down_revision = "0019_dialogs_updated_at_default"
+branch_labels = None
+depends_on = None
+
+
+TRIGRAM_INDEXES = (
+    ("ix_dialog_messages_text_trgm", "dialog_messages", "text"),
+    ("ix_dialogs_external_user_id_trgm", "dialogs", "external_user_id"),
+    ("ix_dialogs_external_chat_id_trgm", "dialogs", "external_chat_id"),
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for index_name, table_name, column_name in TRIGRAM_INDEXES:
+        op.create_index(
+            index_name,
+            table_name,
+            [column_name],
+            postgresql_using="gin",
+            postgresql_ops={column_name: "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    for index_name, table_name, _column_name in reversed(TRIGRAM_INDEXES):
+        op.drop_index(index_name, table_name=table_name)
@@ -0,0 +1,27 @@
+"""add dialogs index for bot listings filtered by lock state
+
+Revision ID: 0021_dialogs_bot_locked_updated
+Revises: 0020_dialog_search_trgm
+Create Date: 2026-10-16 00:00:00.000000
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0021_dialogs_bot_locked_updated"
+down_revision = "0020_dialog_search_trgm"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_dialogs_bot_locked_updated",
+        "dialogs",
+        ["bot_id", "is_locked", "updated_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_dialogs_bot_locked_updated", table_name="dialogs")
@@ -0,0 +1,46 @@
+"""set bitrix timestamp server defaults to utc
+
+Revision ID: 0022_bitrix_timestamps_utc
+Revises: 0021_dialogs_bot_locked_updated
+Create Date: 2026-10-16 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0022_bitrix_timestamps_utc"
+down_revision = "0021_dialogs_bot_locked_updated"
+branch_labels = None
+depends_on = None
+
+
+TIMESTAMP_COLUMNS = (
+    ("bitrix_integrations", "created_at"),
+    ("bitrix_integrations", "updated_at"),
+    ("bitrix_dialog_links", "created_at"),
+    ("bitrix_dialog_links", "updated_at"),
+)
+
+
+def upgrade() -> None:
+    for table_name, column_name in TIMESTAMP_COLUMNS:
+        op.alter_column(
+            table_name,
+            column_name,
+            existing_type=sa.DateTime(),
+            existing_nullable=False,
+            server_default=sa.text("timezone('utc', now())"),
+        )
+
+
+def downgrade() -> None:
+    for table_name, column_name in TIMESTAMP_COLUMNS:
+        op.alter_column(
+            table_name,
+            column_name,
+            existing_type=sa.DateTime(),
+            existing_nullable=False,
+            server_default=sa.func.now(),
+        )
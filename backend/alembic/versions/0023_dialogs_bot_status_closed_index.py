@@ -0,0 +1,27 @@
+"""add dialogs index for per-bot status statistics
+
+Revision ID: 0023_dialogs_bot_status_closed
+Revises: 0022_bitrix_timestamps_utc
+Create Date: 2026-10-16 00:00:00.000000
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0023_dialogs_bot_status_closed"
+down_revision = "0022_bitrix_timestamps_utc"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_dialogs_bot_status_closed",
+        "dialogs",
+        ["bot_id", "status", "closed"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_dialogs_bot_status_closed", table_name="dialogs")
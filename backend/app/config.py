@@ -43,6 +43,51 @@ class Settings(BaseSettings):
         validation_alias=AliasChoices("DB_AUTO_CREATE", "db_auto_create"),
         description="When true, create_all can be used to bootstrap tables automatically (dev only).",
     )
+    db_pool_size: int = Field(
+        default=50,
+        ge=1,
+        validation_alias=AliasChoices("DB_POOL_SIZE", "db_pool_size"),
+        description="Persistent connections kept by the async engine pool (about half of Postgres max_connections).",
+    )
+    db_max_overflow: int = Field(
+        default=20,
+        ge=0,
+        validation_alias=AliasChoices("DB_MAX_OVERFLOW", "db_max_overflow"),
+        description="Extra connections the pool may open above db_pool_size under burst load.",
+    )
+    db_pool_recycle_seconds: int = Field(
+        default=1800,
+        validation_alias=AliasChoices("DB_POOL_RECYCLE_SECONDS", "db_pool_recycle_seconds"),
+        description="Recycle pooled connections older than this many seconds (-1 disables recycling).",
+    )
+    db_pool_pre_ping: bool = Field(
+        default=True,
+        validation_alias=AliasChoices("DB_POOL_PRE_PING", "db_pool_pre_ping"),
+        description="Check pooled connections for liveness before handing them out.",
+    )
+    db_pool_timeout_seconds: float = Field(
+        default=30,
+        gt=0,
+        validation_alias=AliasChoices("DB_POOL_TIMEOUT_SECONDS", "db_pool_timeout_seconds"),
+        description="Seconds a request waits for a free pooled connection before failing.",
+    )
+    db_statement_timeout_ms: int = Field(
+        default=0,
+        ge=0,
+        validation_alias=AliasChoices("DB_STATEMENT_TIMEOUT_MS", "db_statement_timeout_ms"),
+        description="Postgres statement_timeout for application connections in milliseconds (0 disables it).",
+    )
+    db_query_cache_size: int = Field(
+        default=1200,
+        ge=0,
+        validation_alias=AliasChoices("DB_QUERY_CACHE_SIZE", "db_query_cache_size"),
+        description="Entries in SQLAlchemy's compiled statement cache (0 disables caching).",
+    )
+    sql_strict_load: bool = Field(
+        default=False,
+        validation_alias=AliasChoices("SQL_STRICT_LOAD", "sql_strict_load"),
+        description="Raise on lazy loads not covered by explicit loader options (enable in dev/test).",
+    )
 
     # JWT
     jwt_secret_key: str = Field(
@@ -64,6 +109,13 @@ class Settings(BaseSettings):
         default=30,
         validation_alias=AliasChoices("REFRESH_TOKEN_EXPIRES_DAYS", "refresh_token_expires_days"),
     )
+    password_bcrypt_rounds: int = Field(
+        default=12,
+        ge=4,
+        le=31,
+        validation_alias=AliasChoices("PASSWORD_BCRYPT_ROUNDS", "password_bcrypt_rounds"),
+        description="bcrypt cost factor (log2 of rounds) for newly hashed passwords.",
+    )
 
     # Telegram auth
     auth_telegram_only: bool = Field(
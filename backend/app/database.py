@@ -1,16 +1,73 @@
+import logging
+
+from sqlalchemy import DateTime, event
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.sql.expression import FunctionElement
 
 from app.config import settings
+from app.utils import json_codec
+
+logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
+
+class server_utcnow(FunctionElement):
+    """Current UTC time evaluated by the database, as a naive timestamp."""
+
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(server_utcnow)
+def _compile_server_utcnow(_element, _compiler, **_kw) -> str:
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(server_utcnow, "postgresql")
+def _compile_server_utcnow_postgresql(_element, _compiler, **_kw) -> str:
+    return "timezone('utc', now())"
+
+
+@compiles(server_utcnow, "sqlite")
+def _compile_server_utcnow_sqlite(_element, _compiler, **_kw) -> str:
+    return "STRFTIME('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+# A statement timeout keeps a stuck query from pinning a pooled connection indefinitely.
+_connect_args = (
+    {"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}}
+    if settings.db_statement_timeout_ms
+    else {}
+)
+
 engine: AsyncEngine = create_async_engine(
     settings.database_url,
     echo=settings.runtime_debug,
     future=True,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout_seconds,
+    pool_recycle=settings.db_pool_recycle_seconds,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    connect_args=_connect_args,
+    query_cache_size=settings.db_query_cache_size,
+    json_serializer=json_codec.dumps,
+    json_deserializer=json_codec.loads,
 )
 
+
+@event.listens_for(engine.sync_engine, "checkout")
+def _warn_on_pool_saturation(_dbapi_connection, _connection_record, _connection_proxy) -> None:
+    """Log when every pooled and overflow connection is in use and new checkouts will queue."""
+
+    pool = engine.pool
+    if pool.checkedout() >= settings.db_pool_size + settings.db_max_overflow:
+        logger.warning("Database connection pool saturated: %s", pool.status())
+
+
 async_session_factory = async_sessionmaker(
     bind=engine,
     expire_on_commit=False,
@@ -2,6 +2,7 @@ import logging
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from sqlalchemy import text
 
 from app.config import settings
@@ -13,13 +14,17 @@ from app.modules.bots import router as bots_router
 from app.modules.channels import router as channels_router
 from app.modules.diagnostics import router as diagnostics_router
 from app.modules.dialogs import router as dialogs_router
+from app.modules.dialogs.request_cache import DialogRequestCacheMiddleware
 from app.modules.integrations.bitrix24.router import router as bitrix_integrations_router
+from app.modules.integrations.bitrix24.service import close_bitrix_http_client
 from app.modules.stats import router as stats_router
 from app.modules.webchat.router import router as webchat_router
+from app.utils.json_codec import ORJSON_AVAILABLE
 
 app = FastAPI(
     title=settings.app_name,
     debug=settings.runtime_debug,
+    default_response_class=ORJSONResponse if ORJSON_AVAILABLE else JSONResponse,
 )
 
 
@@ -49,6 +54,7 @@ def configure_cors() -> None:
 
 
 configure_cors()
+app.add_middleware(DialogRequestCacheMiddleware)
 
 app.include_router(accounts_router.router)
 app.include_router(auth_router.router)
@@ -75,8 +81,14 @@ async def verify_database_connection() -> None:
     try:
         async with engine.begin() as conn:
             await conn.execute(text("SELECT 1"))
+        logging.info("Database pool ready: %s", engine.pool.status())
     except Exception:  # pragma: no cover - defensive logging
         logging.exception(
             "Database connection failed. Check DATABASE_URL (port, host, credentials) and ensure the DB is running."
         )
         raise
+
+
+@app.on_event("shutdown")
+async def close_http_clients() -> None:
+    await close_bitrix_http_client()
@@ -160,7 +160,7 @@ class AccountsService:
                 if value is not None:
                     stmt = stmt.where(getattr(Account, field) == value)
         result = await session.execute(stmt)
-        return result.scalars().unique().all()
+        return result.scalars().all()
 
     async def update(self, session: AsyncSession, db_obj: Account, obj_in: AccountUpdate) -> Account:
         data = obj_in.model_dump(exclude_unset=True)
@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta
+import hmac
 from pathlib import Path
 import re
 import secrets
@@ -644,7 +645,9 @@ async def telegram_webhook(
         secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token") or request.headers.get(
             "X-Telegram-Secret"
         )
-    if not settings.telegram_webhook_secret or secret != settings.telegram_webhook_secret:
+    if not settings.telegram_webhook_secret or not hmac.compare_digest(
+        (secret or "").encode(), settings.telegram_webhook_secret.encode()
+    ):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid webhook secret")
 
     if not settings.telegram_auth_bot_token:
@@ -318,21 +318,19 @@ async def _broadcast_message_events(messages, dialog, dialog_created: bool) -> N
 
     for message in messages:
         message_payload = DialogMessageOut.model_validate(message).model_dump(mode="json")
-        await manager.broadcast_to_admins({"event": "message_created", "data": message_payload}, admin_ids=admin_targets)
-        await manager.broadcast_to_admins({"event": "dialog_updated", "data": dialog_payload}, admin_ids=admin_targets)
+        events = [
+            {"event": "message_created", "data": message_payload},
+            {"event": "dialog_updated", "data": dialog_payload},
+        ]
+        await manager.broadcast_many(events, admin_ids=admin_targets)
 
         if (message_payload.get("payload") or {}).get("system"):
             continue
 
-        await manager.broadcast_to_webchat(
-            bot_id=dialog_payload["bot_id"],
-            session_id=dialog_payload["external_chat_id"],
-            message={"event": "message_created", "data": message_payload},
-        )
-        await manager.broadcast_to_webchat(
+        await manager.broadcast_many_to_webchat(
             bot_id=dialog_payload["bot_id"],
             session_id=dialog_payload["external_chat_id"],
-            message={"event": "dialog_updated", "data": dialog_payload},
+            messages=events,
         )
 
 
@@ -923,7 +921,9 @@ async def avito_webhook(
             )
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Avito webhook secret not configured")
 
-        if expected_secret != provided_secret:
+        if provided_secret is None or not hmac.compare_digest(
+            provided_secret.encode(), str(expected_secret).encode()
+        ):
             logger.warning(
                 "Invalid Avito webhook secret",
                 extra={"bot_id": bot_id, "channel_id": channel_id},
@@ -4,6 +4,7 @@ from __future__ import annotations
 import logging
 import time
 from abc import ABC, abstractmethod
+from functools import lru_cache
 
 import httpx
 from sqlalchemy import select
@@ -43,6 +44,7 @@ def register_sender(channel_type: ChannelType, sender_cls: type[BaseChannelSende
     """Register a sender implementation for a given channel type."""
 
     _sender_registry[channel_type] = sender_cls
+    get_sender_instance.cache_clear()
 
 
 def get_sender(channel_type: ChannelType) -> type[BaseChannelSender]:
@@ -51,6 +53,17 @@ def get_sender(channel_type: ChannelType) -> type[BaseChannelSender]:
     return _sender_registry[channel_type]
 
 
+@lru_cache(maxsize=None)
+def get_sender_instance(channel_type: ChannelType) -> BaseChannelSender:
+    """Return a shared sender instance for a given channel type.
+
+    Senders keep no per-message state, so one instance per channel type is reused
+    instead of constructing a new sender for every outgoing message.
+    """
+
+    return _sender_registry[channel_type]()
+
+
 class TelegramSender(BaseChannelSender):
     def __init__(self) -> None:
         self.channels_service = ChannelsService()
@@ -5,9 +5,12 @@ import json
 from datetime import datetime
 from types import SimpleNamespace
 
+from starlette.websockets import WebSocketState
+
 from app.modules.channels.models import ChannelType
 from app.modules.channels import router as channels_router
 from app.modules.dialogs import router as dialogs_router
+from app.modules.dialogs.websocket_manager import WebSocketManager
 from app.modules.dialogs.models import DialogStatus, MessageSender
 
 
@@ -65,8 +68,16 @@ def test_channel_broadcast_message_events_payloads_are_json_serializable(monkeyp
     async def broadcast_to_webchat(*, bot_id, session_id, message):
         captured.append(message)
 
+    async def broadcast_many(messages, admin_ids=None):
+        captured.extend(messages)
+
+    async def broadcast_many_to_webchat(*, bot_id, session_id, messages):
+        captured.extend(messages)
+
     monkeypatch.setattr(channels_router.manager, "broadcast_to_admins", broadcast_to_admins)
     monkeypatch.setattr(channels_router.manager, "broadcast_to_webchat", broadcast_to_webchat)
+    monkeypatch.setattr(channels_router.manager, "broadcast_many", broadcast_many)
+    monkeypatch.setattr(channels_router.manager, "broadcast_many_to_webchat", broadcast_many_to_webchat)
 
     message = _message()
     dialog = _dialog(messages=[message])
@@ -85,3 +96,58 @@ def test_dialog_detail_websocket_payload_is_json_serializable():
     json.dumps(payload)
     _assert_json_payload(payload)
     _assert_json_payload(payload["messages"][0])
+
+
+class _FakeWebSocket:
+    def __init__(self, *, fail=False):
+        self.application_state = WebSocketState.CONNECTED
+        self.fail = fail
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.fail:
+            raise RuntimeError("socket closed")
+        self.sent.append(json.loads(text))
+
+
+def test_broadcast_many_sends_ordered_frames_and_drops_failed_sockets():
+    ws_manager = WebSocketManager()
+    healthy, other_admin, broken = _FakeWebSocket(), _FakeWebSocket(), _FakeWebSocket(fail=True)
+    events = [{"event": "message_created", "data": {"id": 1}}, {"event": "dialog_updated", "data": {"id": 2}}]
+
+    async def _case():
+        await ws_manager.register_admin(1, healthy)
+        await ws_manager.register_admin(1, broken)
+        await ws_manager.register_admin(2, other_admin)
+        await ws_manager.broadcast_many(events)
+
+    asyncio.run(_case())
+
+    assert healthy.sent == events
+    assert other_admin.sent == events
+    assert ws_manager._admin_connections[1] == {healthy}
+    assert broken not in ws_manager._admin_by_socket
+
+
+def test_broadcast_new_message_reaches_admins_and_webchat_in_one_pass():
+    ws_manager = WebSocketManager()
+    admin, webchat = _FakeWebSocket(), _FakeWebSocket()
+    dialog_payload = {"id": 10, "bot_id": 3, "external_chat_id": "chat-14"}
+    message_payload = {"id": 20, "dialog_id": 10}
+
+    async def _case():
+        await ws_manager.register_admin(1, admin)
+        await ws_manager.register_webchat(3, "chat-14", webchat)
+        await ws_manager.broadcast_new_message(dialog_payload=dialog_payload, message_payload=message_payload)
+
+    asyncio.run(_case())
+
+    expected = [
+        {"event": "message_created", "data": message_payload},
+        {"event": "dialog_updated", "data": dialog_payload},
+    ]
+    assert admin.sent == expected
+    assert webchat.sent == expected
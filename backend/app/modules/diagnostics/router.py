@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import hmac
+
 from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -19,7 +21,11 @@ async def _verify_internal_key(
     x_internal_api_key: str | None = Header(default=None, alias="X-Internal-Api-Key"),
 ) -> None:
     provided_key = x_internal_api_key or x_internal_key
-    if not provided_key or provided_key != settings.internal_api_key:
+    if (
+        not provided_key
+        or not settings.internal_api_key
+        or not hmac.compare_digest(provided_key.encode(), settings.internal_api_key.encode())
+    ):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
 
 
@@ -3,12 +3,13 @@ from __future__ import annotations
 
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
 
-from sqlalchemy import Boolean, DateTime, Enum as SQLEnum, ForeignKey, Index, Integer, String
+from sqlalchemy import Boolean, DateTime, Enum as SQLEnum, ForeignKey, Index, Integer, String, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from app.database import Base
+from app.database import Base, server_utcnow
 from app.modules.accounts.models import User
 from app.modules.channels.models import ChannelType, channel_type_enum
 
@@ -28,6 +29,11 @@ def normalize_dialog_status(value: DialogStatus | str) -> DialogStatus:
         return value
     if not isinstance(value, str):
         raise ValueError(f"Unknown dialog status: {value}")
+    return _normalize_dialog_status_name(value)
+
+
+@lru_cache(maxsize=32)
+def _normalize_dialog_status_name(value: str) -> DialogStatus:
     normalized = value.strip()
     try:
         return DialogStatus(normalized)
@@ -38,6 +44,9 @@ def normalize_dialog_status(value: DialogStatus | str) -> DialogStatus:
             raise ValueError(f"Unknown dialog status: {value}") from exc
 
 
+# Predicate of the partial unique index that allows one open dialog per chat.
+OPEN_DIALOG_PREDICATE = text("closed IS FALSE")
+
 DIALOG_STATUS_ENUM = SQLEnum(
     DialogStatus,
     name="dialog_status",
@@ -50,6 +59,19 @@ class Dialog(Base):
     __tablename__ = "dialogs"
     __table_args__ = (
         Index("ix_dialog_bot_channel_chat", "bot_id", "channel_type", "external_chat_id"),
+        # Serves the admin listing: bot_id/is_locked filters ordered by updated_at DESC.
+        Index("ix_dialogs_bot_locked_updated", "bot_id", "is_locked", "updated_at"),
+        # Covers the stats summary's per-bot status and open/closed counts with an index-only scan.
+        Index("ix_dialogs_bot_status_closed", "bot_id", "status", "closed"),
+        Index(
+            "uq_dialogs_open_chat",
+            "bot_id",
+            "channel_type",
+            "external_chat_id",
+            unique=True,
+            postgresql_where=OPEN_DIALOG_PREDICATE,
+            sqlite_where=OPEN_DIALOG_PREDICATE,
+        ),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -72,7 +94,12 @@ class Dialog(Base):
     )
     waiting_time_seconds: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, nullable=False)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, onupdate=utcnow, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=server_utcnow(), onupdate=server_utcnow(), nullable=False
+    )
+
+    # Fetch server-generated updated_at with RETURNING on flush so callers never need a refresh.
+    __mapper_args__ = {"eager_defaults": True}
 
     bot: Mapped["Bot"] = relationship(
         "Bot",
@@ -88,6 +115,7 @@ class Dialog(Base):
         back_populates="dialog",
         cascade="all, delete-orphan",
         passive_deletes=True,
+        order_by="(DialogMessage.created_at, DialogMessage.id)",
     )
 
 
@@ -107,12 +135,21 @@ MESSAGE_SENDER_ENUM = SQLEnum(
 
 class DialogMessage(Base):
     __tablename__ = "dialog_messages"
+    __table_args__ = (
+        # Serves the latest-message lookups and keyset history pages per dialog.
+        Index(
+            "ix_dialog_messages_dialog_id_created_at_desc",
+            "dialog_id",
+            text("created_at DESC"),
+            text("id DESC"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     dialog_id: Mapped[int] = mapped_column(Integer, ForeignKey("dialogs.id", ondelete="CASCADE"), nullable=False, index=True)
     sender: Mapped[MessageSender] = mapped_column(MESSAGE_SENDER_ENUM, nullable=False)
     text: Mapped[str | None] = mapped_column(String, nullable=True)
-    payload: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    payload: Mapped[dict | None] = mapped_column(JSONB(none_as_null=True), nullable=True)
     operator_admin_id: Mapped[int | None] = mapped_column(
         Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True
     )
@@ -0,0 +1,62 @@
+"""Per-request memoization of dialog lookups.
+
+The cache lives in a context variable that ``DialogRequestCacheMiddleware`` scopes
+to a single HTTP request. Outside a request (background tasks, scripts) no cache
+is active and every lookup goes to the database.
+"""
+from __future__ import annotations
+
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from app.modules.dialogs.models import Dialog
+
+_dialog_cache: ContextVar[dict[tuple[int | None, int], "Dialog"] | None] = ContextVar("_dialog_cache", default=None)
+
+
+def get_cached_dialog(session: "AsyncSession", bot_id: int | None, dialog_id: int) -> "Dialog | None":
+    """Return a memoized dialog if it is still attached to ``session``."""
+
+    cache = _dialog_cache.get()
+    if cache is None:
+        return None
+    dialog = cache.get((bot_id, dialog_id))
+    if dialog is None or dialog not in session:
+        return None
+    return dialog
+
+
+def cache_dialog(bot_id: int | None, dialog: "Dialog") -> None:
+    cache = _dialog_cache.get()
+    if cache is not None:
+        cache[(bot_id, dialog.id)] = dialog
+
+
+def invalidate_dialog(dialog_id: int) -> None:
+    """Drop every memoized entry for ``dialog_id`` after it has been modified."""
+
+    cache = _dialog_cache.get()
+    if cache:
+        for key in [key for key in cache if key[1] == dialog_id]:
+            del cache[key]
+
+
+class DialogRequestCacheMiddleware:
+    """ASGI middleware that gives each HTTP request its own dialog cache."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = _dialog_cache.set({})
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _dialog_cache.reset(token)
@@ -12,10 +12,17 @@ from app.modules.ai.service import AIService, get_ai_service
 from app.modules.accounts.models import User
 from app.modules.bots.models import Bot
 from app.modules.channels.models import BotChannel, ChannelType
-from app.modules.channels.sender_registry import get_sender
+from app.modules.channels.sender_registry import get_sender_instance
 from app.modules.channels.webchat_handler import handle_webchat_ws_message
 from app.modules.dialogs.models import Dialog, DialogStatus, MessageSender
-from app.modules.dialogs.schemas import DialogDetail, DialogMessageOut, DialogShort, DialogWaitingOperatorCountOut, ListResponse
+from app.modules.dialogs.schemas import (
+    DialogDetail,
+    DialogMessageOut,
+    DialogMessagesPage,
+    DialogShort,
+    DialogWaitingOperatorCountOut,
+    ListResponse,
+)
 from app.modules.dialogs.service import DialogLockError, DialogMessagesService, DialogsService
 from app.modules.dialogs.websocket_manager import manager
 from app.security.auth import get_current_user
@@ -43,10 +50,8 @@ def _build_dialog_short(dialog: Dialog, last_message: object | None) -> DialogSh
 
 
 def _build_dialog_detail(dialog: Dialog) -> DialogDetail:
-    base = DialogDetail.model_validate(dialog)
-    msgs_sorted = sorted(dialog.messages, key=lambda m: m.created_at) if dialog.messages else []
-    msgs_out = [DialogMessageOut.model_validate(message) for message in msgs_sorted]
-    return base.model_copy(update={"messages": msgs_out})
+    # Dialog.messages is ordered by created_at at load time, so one validation pass covers the messages too.
+    return DialogDetail.model_validate(dialog)
 
 
 async def _unlock_expired_dialog(
@@ -392,6 +397,37 @@ async def list_messages(
     )
 
 
+@router.get("/dialogs/{dialog_id}/messages/history", response_model=DialogMessagesPage)
+async def list_message_history(
+    dialog_id: int,
+    cursor: str | None = None,
+    limit: int = 50,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db_session),
+    service: DialogMessagesService = Depends(DialogMessagesService),
+    dialogs_service: DialogsService = Depends(DialogsService),
+) -> DialogMessagesPage:
+    validate_pagination(1, limit)
+
+    dialog = await dialogs_service.get(session=session, bot_id=None, dialog_id=dialog_id)
+    if not dialog:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dialog not found")
+
+    await require_bot_access(dialog.bot_id, session, current_user)
+
+    try:
+        items, next_cursor = await service.list_for_dialog(
+            session=session, dialog_id=dialog_id, cursor=cursor, limit=limit
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+    return DialogMessagesPage(
+        items=[DialogMessageOut.model_validate(message) for message in items],
+        next_cursor=next_cursor,
+    )
+
+
 @router.websocket("/ws/admin")
 async def ws_admin(websocket: WebSocket, token: str) -> None:
     try:
@@ -496,8 +532,8 @@ async def _create_operator_message(
 
     if data.text and dialog.channel_type != ChannelType.WEBCHAT:
         try:
-            sender_cls = get_sender(dialog.channel_type)
-            await sender_cls().send_text(
+            sender = get_sender_instance(dialog.channel_type)
+            await sender.send_text(
                 bot_id=dialog.bot_id,
                 external_chat_id=dialog.external_chat_id,
                 text=data.text,
@@ -527,18 +563,15 @@ async def _create_operator_message(
             message={"event": "dialog_created", "data": dialog_payload},
         )
 
-    await manager.broadcast_to_admins({"event": "message_created", "data": message_payload}, admin_ids=admin_targets)
-    await manager.broadcast_to_admins({"event": "dialog_updated", "data": dialog_payload}, admin_ids=admin_targets)
-
-    await manager.broadcast_to_webchat(
-        bot_id=dialog_payload["bot_id"],
-        session_id=dialog_payload["external_chat_id"],
-        message={"event": "message_created", "data": message_payload},
-    )
-    await manager.broadcast_to_webchat(
+    events = [
+        {"event": "message_created", "data": message_payload},
+        {"event": "dialog_updated", "data": dialog_payload},
+    ]
+    await manager.broadcast_many(events, admin_ids=admin_targets)
+    await manager.broadcast_many_to_webchat(
         bot_id=dialog_payload["bot_id"],
         session_id=dialog_payload["external_chat_id"],
-        message={"event": "dialog_updated", "data": dialog_payload},
+        messages=events,
     )
 
     return DialogMessageOut.model_validate(message)
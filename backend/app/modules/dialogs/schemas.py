@@ -99,6 +99,11 @@ class DialogMessageOut(DialogMessageBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class DialogMessagesPage(BaseModel):
+    items: list[DialogMessageOut]
+    next_cursor: str | None = None
+
+
 class DialogAdminOut(BaseModel):
     id: int
     first_name: str | None = None
@@ -2,28 +2,41 @@
 from __future__ import annotations
 
 import asyncio
+import base64
+import binascii
 import logging
 import unicodedata
 from datetime import datetime, timedelta
 from typing import Any
 
-from sqlalchemy import func, or_, select
+from sqlalchemy import and_, bindparam, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased, raiseload, selectinload
 
+from app.config import settings
 from app.modules.ai.service import AIService
 from app.modules.accounts.models import Account, User, UserRole, account_operators
 from app.modules.bots.models import Bot, BotAdmin
 from app.modules.channels.models import ChannelType
 from app.modules.channels.schemas import NormalizedIncomingMessage
-from app.modules.channels.sender_registry import get_sender
-from app.modules.dialogs.models import Dialog, DialogMessage, DialogStatus, MessageSender, normalize_dialog_status
+from app.modules.channels.sender_registry import get_sender_instance
+from app.modules.dialogs.models import (
+    OPEN_DIALOG_PREDICATE,
+    Dialog,
+    DialogMessage,
+    DialogStatus,
+    MessageSender,
+    normalize_dialog_status,
+)
+from app.modules.dialogs.request_cache import cache_dialog, get_cached_dialog, invalidate_dialog
 from app.modules.dialogs.schemas import (
     DialogCreate,
     DialogMessageCreate,
     DialogUpdate,
 )
-from app.modules.integrations.bitrix24.service import Bitrix24Service
+from app.modules.integrations.bitrix24.service import get_bitrix24_service
 from app.utils.validators import validate_pagination
 
 logger = logging.getLogger(__name__)
@@ -32,6 +45,58 @@ HANDOFF_TEXT = "Передаю ваш вопрос оператору. Мы от
 AI_CANNOT_ANSWER_TEXT = "К сожалению, сейчас я не могу ответить на этот вопрос."
 OPERATOR_MODE_TIMEOUT = timedelta(hours=1)
 
+# Hot statements are built once with bound parameters so each call reuses the same
+# construct and hits the engine's compiled cache without rebuilding the expression tree.
+_OPEN_DIALOG_STMT = (
+    select(Dialog)
+    .where(
+        Dialog.bot_id == bindparam("bot_id"),
+        Dialog.channel_type == bindparam("channel_type"),
+        Dialog.external_chat_id == bindparam("external_chat_id"),
+        Dialog.closed.is_(False),
+    )
+    .order_by(Dialog.updated_at.desc())
+)
+
+
+# Bitrix24 mirroring runs in the background; cap concurrent syncs so a burst of incoming
+# messages does not crowd out webhook handling on the event loop.
+BITRIX_SYNC_CONCURRENCY = 8
+_bitrix_sync_semaphore = asyncio.Semaphore(BITRIX_SYNC_CONCURRENCY)
+_bitrix_sync_tasks: set[asyncio.Task[None]] = set()
+
+
+async def _bounded_bitrix_sync(*, bot_id: int, dialog_id: int, text: str | None, dialog_created: bool) -> None:
+    async with _bitrix_sync_semaphore:
+        await get_bitrix24_service().sync_incoming_user_message(
+            bot_id=bot_id,
+            dialog_id=dialog_id,
+            text=text,
+            dialog_created=dialog_created,
+        )
+
+
+# Outgoing bot replies whose first send failed are retried in the background with a growing delay.
+SEND_RETRY_ATTEMPTS = 3
+SEND_RETRY_DELAY_SECONDS = 2.0
+_send_retry_tasks: set[asyncio.Task[None]] = set()
+
+
+async def _retry_send_text(
+    *, dialog_id: int, bot_id: int, channel_type: ChannelType, external_chat_id: str, text: str
+) -> None:
+    log_extra = {"bot_id": bot_id, "dialog_id": dialog_id, "channel_type": channel_type}
+    for attempt in range(1, SEND_RETRY_ATTEMPTS + 1):
+        await asyncio.sleep(SEND_RETRY_DELAY_SECONDS * attempt)
+        try:
+            await get_sender_instance(channel_type).send_text(
+                bot_id=bot_id, external_chat_id=external_chat_id, text=text
+            )
+            return
+        except Exception:  # noqa: BLE001
+            logger.warning("Bot message send retry failed", exc_info=True, extra={**log_extra, "attempt": attempt})
+    logger.error("Bot message was stored but could not be delivered", extra=log_extra)
+
 
 def _is_operator_mode_active(dialog: Dialog, now: datetime) -> bool:
     return (
@@ -51,6 +116,51 @@ def _normalize_handoff_text(value: str) -> str:
     return " ".join("".join(chars).split())
 
 
+def _encode_message_cursor(message: DialogMessage) -> str:
+    raw = f"{message.created_at.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_message_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at_raw, message_id_raw = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at_raw), int(message_id_raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def _strict_load_options() -> tuple[Any, ...]:
+    """Loader options that turn unplanned lazy loads into errors when SQL_STRICT_LOAD is on."""
+
+    return (raiseload("*"),) if settings.sql_strict_load else ()
+
+
+async def _fetch_page_with_total(
+    session: AsyncSession, stmt: Any, id_column: Any, conditions: list[Any], offset: int, limit: int
+) -> tuple[list[Any], int]:
+    """Fetch one page and the total row count in a single query using COUNT(*) OVER ()."""
+
+    windowed = stmt.add_columns(func.count().over().label("total")).offset(offset).limit(limit)
+    rows = (await session.execute(windowed)).all()
+    if rows:
+        return [row[0] for row in rows], rows[0].total
+    if offset == 0:
+        return [], 0
+    # An out-of-range page returns no rows to carry the window total, so count separately.
+    total_result = await session.execute(
+        select(func.count()).select_from(select(id_column).where(*conditions).subquery())
+    )
+    return [], total_result.scalar_one()
+
+
+def _dialect_insert(session: AsyncSession) -> Any:
+    """Return the dialect-specific INSERT construct that supports ON CONFLICT."""
+
+    if session.get_bind().dialect.name == "sqlite":
+        return sqlite_insert
+    return postgresql_insert
+
+
 def _matches_operator_trigger(message: str, phrases: list[str]) -> bool:
     normalized_message = _normalize_handoff_text(message)
     if not normalized_message:
@@ -118,7 +228,6 @@ class DialogsService:
         if status == DialogStatus.WAIT_OPERATOR and (start_operator_mode or dialog.status != DialogStatus.WAIT_OPERATOR):
             dialog.operator_mode_started_at = now
         dialog.status = status
-        dialog.updated_at = now
         dialog.last_message_at = now
         if status == DialogStatus.WAIT_USER:
             dialog.waiting_time_seconds = (
@@ -132,20 +241,66 @@ class DialogsService:
             text=text,
             payload={"system": True} if system else None,
         )
-        session.add_all([dialog, message])
-        await session.commit()
-        await session.refresh(dialog)
-        await session.refresh(message)
+        session.add(message)
+        await self._commit_and_send(
+            session=session,
+            dialog_id=dialog.id,
+            bot_id=bot_id,
+            channel_type=channel_type,
+            external_chat_id=external_chat_id,
+            text=text,
+        )
+        return message
+
+    async def _commit_and_send(
+        self,
+        *,
+        session: AsyncSession,
+        dialog_id: int,
+        bot_id: int,
+        channel_type: ChannelType,
+        external_chat_id: str,
+        text: str,
+    ) -> None:
+        """Commit pending changes while the outgoing message is sent to the channel.
+
+        The send starts first and overlaps the commit. If the commit fails, an
+        unfinished send is cancelled (a finished one is logged as an orphaned reply)
+        and the error is re-raised. If only the send fails, it is retried in the
+        background because the message is already stored.
+        """
 
+        async def _send() -> None:
+            sender = get_sender_instance(channel_type)
+            await sender.send_text(bot_id=bot_id, external_chat_id=external_chat_id, text=text)
+
+        log_extra = {"bot_id": bot_id, "dialog_id": dialog_id, "channel_type": channel_type}
+        send_task = asyncio.create_task(_send())
+        try:
+            await session.commit()
+        except BaseException:
+            if not send_task.done():
+                send_task.cancel()
+            elif not send_task.cancelled() and send_task.exception() is None:
+                logger.error("Bot message was sent but not stored: commit failed", extra=log_extra)
+            raise
+
+        invalidate_dialog(dialog_id)
         try:
-            sender_cls = get_sender(channel_type)
-            await sender_cls().send_text(bot_id=bot_id, external_chat_id=external_chat_id, text=text)
+            await send_task
         except Exception:  # noqa: BLE001
-            logger.exception(
-                "Bot message send failed",
-                extra={"bot_id": bot_id, "dialog_id": dialog.id, "channel_type": channel_type},
+            logger.warning("Bot message send failed; scheduling retry", exc_info=True, extra=log_extra)
+            retry_task = asyncio.create_task(
+                _retry_send_text(
+                    dialog_id=dialog_id,
+                    bot_id=bot_id,
+                    channel_type=channel_type,
+                    external_chat_id=external_chat_id,
+                    text=text,
+                )
             )
-        return message
+            _send_retry_tasks.add(retry_task)
+            retry_task.add_done_callback(_send_retry_tasks.discard)
 
     async def _handoff_to_operator(
         self,
@@ -199,21 +354,51 @@ class DialogsService:
         )
         session.add(db_obj)
         await session.commit()
-        await session.refresh(db_obj)
         return db_obj
 
     async def get(
         self, session: AsyncSession, bot_id: int | None, dialog_id: int, include_messages: bool = False
     ) -> Dialog | None:
+        if not include_messages:
+            # Primary-key lookup consults the identity map first and skips the SELECT on a hit;
+            # assigned_admin is eager-loaded because DialogOut serializes it.
+            dialog = await session.get(Dialog, dialog_id, options=[selectinload(Dialog.assigned_admin)])
+            if dialog is None or (bot_id is not None and dialog.bot_id != bot_id):
+                return None
+            return dialog
+
+        cached = get_cached_dialog(session, bot_id, dialog_id)
+        if cached is not None:
+            return cached
+
         stmt = select(Dialog).where(Dialog.id == dialog_id)
         if bot_id is not None:
             stmt = stmt.where(Dialog.bot_id == bot_id)
-        stmt = stmt.options(selectinload(Dialog.assigned_admin))
-        if include_messages:
-            # Keep eager loading simple; message ordering is handled when serializing the response.
-            stmt = stmt.options(selectinload(Dialog.messages).selectinload(DialogMessage.operator_admin))
+        stmt = stmt.options(
+            selectinload(Dialog.assigned_admin),
+            # The relationship is ordered, so messages arrive sorted from the database.
+            selectinload(Dialog.messages).selectinload(DialogMessage.operator_admin),
+            *_strict_load_options(),
+        )
+        # Mutations commit without a refresh, so re-populate relationships that may already be loaded.
+        stmt = stmt.execution_options(populate_existing=True)
         result = await session.execute(stmt)
-        return result.scalars().unique().first()
+        dialog = result.scalars().first()
+        if dialog is not None:
+            cache_dialog(bot_id, dialog)
+        return dialog
+
+    async def get_many(self, session: AsyncSession, bot_id: int | None, dialog_ids: list[int]) -> dict[int, Dialog]:
+        """Fetch several dialogs in one query, keyed by id; missing ids are omitted."""
+
+        if not dialog_ids:
+            return {}
+
+        stmt = select(Dialog).where(Dialog.id.in_(set(dialog_ids)))
+        if bot_id is not None:
+            stmt = stmt.where(Dialog.bot_id == bot_id)
+        result = await session.execute(stmt)
+        return {dialog.id: dialog for dialog in result.scalars().all()}
 
     async def get_or_create_dialog(
         self,
@@ -223,37 +408,40 @@ class DialogsService:
         external_chat_id: str,
         external_user_id: str | None = None,
     ) -> tuple[Dialog, bool]:
-        locked_bot = await session.scalar(select(Bot).where(Bot.id == bot_id).with_for_update())
-        if locked_bot is None:
+        params = {"bot_id": bot_id, "channel_type": channel_type, "external_chat_id": external_chat_id}
+        result = await session.execute(_OPEN_DIALOG_STMT, params)
+        dialog = result.scalars().first()
+        if dialog:
+            return dialog, False
+
+        if await session.get(Bot, bot_id) is None:
             raise ValueError("Bot not found")
 
-        stmt = (
-            select(Dialog)
-            .where(
-                Dialog.bot_id == bot_id,
-                Dialog.channel_type == channel_type,
-                Dialog.external_chat_id == external_chat_id,
-                Dialog.closed.is_(False),
+        # The partial unique index on open dialogs arbitrates concurrent creators: the loser's
+        # insert becomes a no-op and it picks up the winner's row with the lookup above.
+        insert_stmt = (
+            _dialect_insert(session)(Dialog)
+            .values(
+                bot_id=bot_id,
+                channel_type=channel_type,
+                external_chat_id=external_chat_id,
+                external_user_id=external_user_id or external_chat_id,
+                status=DialogStatus.AUTO,
+                closed=False,
+            )
+            .on_conflict_do_nothing(
+                index_elements=[Dialog.bot_id, Dialog.channel_type, Dialog.external_chat_id],
+                index_where=OPEN_DIALOG_PREDICATE,
             )
-            .order_by(Dialog.updated_at.desc())
+            .returning(Dialog)
         )
-        result = await session.execute(stmt)
+        result = await session.execute(insert_stmt)
         dialog = result.scalars().first()
-        if dialog:
-            return dialog, False
+        if dialog is not None:
+            return dialog, True
 
-        dialog = Dialog(
-            bot_id=bot_id,
-            channel_type=channel_type,
-            external_chat_id=external_chat_id,
-            external_user_id=external_user_id or external_chat_id,
-            status=DialogStatus.AUTO,
-            closed=False,
-        )
-        session.add(dialog)
-        await session.commit()
-        await session.refresh(dialog)
-        return dialog, True
+        result = await session.execute(_OPEN_DIALOG_STMT, params)
+        return result.scalars().one(), False
 
     async def list(
         self,
@@ -274,16 +462,12 @@ class DialogsService:
         stmt = select(Dialog).where(*conditions).order_by(Dialog.updated_at.desc())
         stmt = stmt.options(selectinload(Dialog.assigned_admin))
         if include_messages:
-            # Keep eager loading simple; message ordering is handled when serializing the response.
             stmt = stmt.options(selectinload(Dialog.messages).selectinload(DialogMessage.operator_admin))
+        stmt = stmt.options(*_strict_load_options())
 
-        total_result = await session.execute(
-            select(func.count()).select_from(select(Dialog.id).where(*conditions).subquery())
+        items, total = await _fetch_page_with_total(
+            session, stmt, Dialog.id, conditions, (page - 1) * per_page, per_page
         )
-        total = total_result.scalar_one()
-
-        result = await session.execute(stmt.offset((page - 1) * per_page).limit(per_page))
-        items = result.scalars().unique().all()
         has_next = page * per_page < total
         return items, total, has_next
 
@@ -310,32 +494,28 @@ class DialogsService:
         if channel_type is not None:
             conditions.append(Dialog.channel_type == channel_type)
 
-        search_expr = None
         if query:
             pattern = f"%{query}%"
-            search_expr = or_(
-                DialogMessage.text.ilike(pattern),
-                Dialog.external_user_id.ilike(pattern),
-                Dialog.external_chat_id.ilike(pattern),
+            message_matches = (
+                select(DialogMessage.id)
+                .where(DialogMessage.dialog_id == Dialog.id, DialogMessage.text.ilike(pattern))
+                .exists()
             )
-
-        stmt = select(Dialog).where(*conditions)
-        count_stmt = select(func.count(func.distinct(Dialog.id))).select_from(Dialog).where(*conditions)
-
-        if search_expr is not None:
-            stmt = stmt.join(DialogMessage, DialogMessage.dialog_id == Dialog.id, isouter=True).where(search_expr)
-            count_stmt = count_stmt.join(DialogMessage, DialogMessage.dialog_id == Dialog.id, isouter=True).where(
-                search_expr
+            conditions.append(
+                or_(
+                    message_matches,
+                    Dialog.external_user_id.ilike(pattern),
+                    Dialog.external_chat_id.ilike(pattern),
+                )
             )
 
-        stmt = stmt.order_by(Dialog.last_message_at.desc()).offset(offset).limit(limit)
-        stmt = stmt.options(selectinload(Dialog.assigned_admin))
-
-        result = await session.execute(stmt)
-        dialogs = result.scalars().unique().all()
-
-        total_result = await session.execute(count_stmt)
-        total = total_result.scalar_one()
+        stmt = (
+            select(Dialog)
+            .where(*conditions)
+            .order_by(Dialog.last_message_at.desc())
+            .options(selectinload(Dialog.assigned_admin), *_strict_load_options())
+        )
+        dialogs, total = await _fetch_page_with_total(session, stmt, Dialog.id, conditions, offset, limit)
         has_next = offset + limit < total
 
         return dialogs, total, has_next
@@ -362,36 +542,40 @@ class DialogsService:
             select(Dialog)
             .where(*conditions)
             .order_by(Dialog.last_message_at.desc())
-            .options(selectinload(Dialog.assigned_admin))
+            .options(selectinload(Dialog.assigned_admin), *_strict_load_options())
         )
-        total_result = await session.execute(
-            select(func.count()).select_from(select(Dialog.id).where(*conditions).subquery())
+        items, total = await _fetch_page_with_total(
+            session, stmt, Dialog.id, conditions, (page - 1) * per_page, per_page
         )
-        total = total_result.scalar_one()
-        result = await session.execute(stmt.offset((page - 1) * per_page).limit(per_page))
-        items = result.scalars().unique().all()
         has_next = page * per_page < total
         return items, total, has_next
 
     async def update(self, session: AsyncSession, db_obj: Dialog, obj_in: DialogUpdate) -> Dialog:
         data = obj_in.model_dump(exclude_unset=True)
-        for field, value in data.items():
-            if field == "status" and value is not None:
-                value = normalize_dialog_status(value)
-            setattr(db_obj, field, value)
-        session.add(db_obj)
+        if not data:
+            return db_obj
+        if data.get("status") is not None:
+            data["status"] = normalize_dialog_status(data["status"])
+
+        invalidate_dialog(db_obj.id)
+        result = await session.execute(
+            update(Dialog).where(Dialog.id == db_obj.id).values(**data).returning(Dialog)
+        )
+        updated_dialog = result.scalars().one()
         await session.commit()
-        await session.refresh(db_obj)
-        return db_obj
+        return updated_dialog
 
     async def close_dialog(self, session: AsyncSession, dialog: Dialog) -> Dialog:
-        dialog.closed = True
-        dialog.updated_at = datetime.utcnow()
-
-        session.add(dialog)
+        invalidate_dialog(dialog.id)
+        result = await session.execute(
+            update(Dialog)
+            .where(Dialog.id == dialog.id)
+            .values(closed=True)
+            .returning(Dialog)
+        )
+        closed_dialog = result.scalars().one()
         await session.commit()
-        await session.refresh(dialog)
-        return dialog
+        return closed_dialog
 
     async def lock_dialog(self, session: AsyncSession, dialog: Dialog, admin_id: int) -> Dialog:
         if dialog.assigned_admin_id not in (None, admin_id):
@@ -400,29 +584,46 @@ class DialogsService:
         if dialog.is_locked and dialog.assigned_admin_id != admin_id:
             raise DialogLockError("Dialog is already locked by another operator")
 
-        dialog.is_locked = True
-        dialog.assigned_admin_id = admin_id
-        dialog.locked_until = None
-        dialog.updated_at = datetime.utcnow()
-
-        session.add(dialog)
+        # The ownership checks are repeated in the WHERE clause so a concurrent lock by
+        # another operator turns this UPDATE into a no-op instead of overwriting it.
+        invalidate_dialog(dialog.id)
+        result = await session.execute(
+            update(Dialog)
+            .where(
+                Dialog.id == dialog.id,
+                or_(
+                    Dialog.assigned_admin_id == admin_id,
+                    and_(Dialog.assigned_admin_id.is_(None), Dialog.is_locked.is_(False)),
+                ),
+            )
+            .values(is_locked=True, assigned_admin_id=admin_id, locked_until=None)
+            .returning(Dialog)
+        )
+        locked_dialog = result.scalars().first()
+        if locked_dialog is None:
+            raise DialogLockError("Dialog is already locked by another operator")
         await session.commit()
-        await session.refresh(dialog)
-        return dialog
+        return locked_dialog
 
     async def unlock_dialog(self, session: AsyncSession, dialog: Dialog, admin_id: int) -> Dialog:
         if dialog.assigned_admin_id not in (None, admin_id):
             raise DialogLockError("Dialog is locked by another operator")
 
-        dialog.is_locked = False
-        dialog.locked_until = None
-        dialog.assigned_admin_id = None
-        dialog.updated_at = datetime.utcnow()
-
-        session.add(dialog)
+        invalidate_dialog(dialog.id)
+        result = await session.execute(
+            update(Dialog)
+            .where(
+                Dialog.id == dialog.id,
+                or_(Dialog.assigned_admin_id.is_(None), Dialog.assigned_admin_id == admin_id),
+            )
+            .values(is_locked=False, locked_until=None, assigned_admin_id=None)
+            .returning(Dialog)
+        )
+        unlocked_dialog = result.scalars().first()
+        if unlocked_dialog is None:
+            raise DialogLockError("Dialog is locked by another operator")
         await session.commit()
-        await session.refresh(dialog)
-        return dialog
+        return unlocked_dialog
 
     async def unlock_if_expired(self, session: AsyncSession, dialog: Dialog) -> tuple[Dialog, bool]:
         """Unlock a dialog when its lock has expired."""
@@ -445,12 +646,12 @@ class DialogsService:
             raise DialogLockError("Dialog is locked by another operator")
 
         if dialog.closed:
-            locked_bot = await session.scalar(select(Bot).where(Bot.id == dialog.bot_id).with_for_update())
-            if locked_bot is None:
+            locked_bot_id = await session.scalar(select(Bot.id).where(Bot.id == dialog.bot_id).with_for_update())
+            if locked_bot_id is None:
                 raise ValueError("Bot not found")
 
-            existing_open_dialog = await session.scalar(
-                select(Dialog).where(
+            existing_open_dialog_id = await session.scalar(
+                select(Dialog.id).where(
                     Dialog.id != dialog.id,
                     Dialog.bot_id == dialog.bot_id,
                     Dialog.channel_type == dialog.channel_type,
@@ -458,7 +659,7 @@ class DialogsService:
                     Dialog.closed.is_(False),
                 )
             )
-            if existing_open_dialog is not None:
+            if existing_open_dialog_id is not None:
                 raise DialogLockError("Для этого чата уже существует активный диалог")
 
         dialog.status = DialogStatus.AUTO
@@ -467,11 +668,10 @@ class DialogsService:
         dialog.is_locked = False
         dialog.locked_until = None
         dialog.assigned_admin_id = None
-        dialog.updated_at = datetime.utcnow()
 
         session.add(dialog)
+        invalidate_dialog(dialog.id)
         await session.commit()
-        await session.refresh(dialog)
         return dialog
 
     async def add_message(
@@ -510,7 +710,6 @@ class DialogsService:
                 int((now - dialog.last_user_message_at).total_seconds()) if dialog.last_user_message_at else 0
             )
             dialog.unread_messages_count = 0
-        dialog.updated_at = now
         dialog.last_message_at = now
 
         message = DialogMessage(
@@ -520,18 +719,38 @@ class DialogsService:
             payload=payload,
             operator_admin_id=operator_admin_id if sender == MessageSender.OPERATOR else None,
         )
-        session.add_all([dialog, message])
+        session.add(message)
+        invalidate_dialog(dialog.id)
         await session.commit()
-        await session.refresh(dialog)
-        await session.refresh(message)
         return message, dialog, dialog_created
 
     async def delete(self, session: AsyncSession, bot_id: int, dialog_id: int) -> None:
         obj = await self.get(session, bot_id, dialog_id)
         if obj:
+            invalidate_dialog(dialog_id)
             await session.delete(obj)
             await session.commit()
 
+    def _schedule_bitrix_sync(
+        self, incoming_message: NormalizedIncomingMessage, *, dialog_id: int, dialog_created: bool
+    ) -> None:
+        try:
+            task = asyncio.create_task(
+                _bounded_bitrix_sync(
+                    bot_id=incoming_message.bot_id,
+                    dialog_id=dialog_id,
+                    text=incoming_message.text,
+                    dialog_created=dialog_created,
+                )
+            )
+            _bitrix_sync_tasks.add(task)
+            task.add_done_callback(_bitrix_sync_tasks.discard)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning(
+                "Bitrix24 sync scheduling failed",
+                extra={"bot_id": incoming_message.bot_id, "dialog_id": dialog_id, "error": str(exc)},
+            )
+
     async def process_incoming_message(
         self,
         session: AsyncSession,
@@ -565,7 +784,10 @@ class DialogsService:
         )
         if not preserve_auto_status:
             dialog.status = DialogStatus.WAIT_OPERATOR
-        dialog.updated_at = now
+        if operator_mode_elapsed and dialog.assigned_admin_id is not None:
+            dialog.is_locked = False
+            dialog.locked_until = None
+            dialog.assigned_admin_id = None
         dialog.last_message_at = now
         dialog.last_user_message_at = now
         dialog.waiting_time_seconds = 0
@@ -577,46 +799,24 @@ class DialogsService:
             text=incoming_message.text,
             payload=incoming_message.payload,
         )
-        session.add_all([dialog, user_message])
-        await session.commit()
-        await session.refresh(dialog)
-        await session.refresh(user_message)
+        session.add(user_message)
+        invalidate_dialog(dialog.id)
 
-        bitrix_service = Bitrix24Service()
-        try:
-            asyncio.create_task(
-                bitrix_service.sync_incoming_user_message(
-                    bot_id=incoming_message.bot_id,
-                    dialog_id=dialog.id,
-                    text=incoming_message.text,
-                    dialog_created=dialog_created,
-                )
-            )
-        except Exception as exc:  # noqa: BLE001
-            logger.warning(
-                "Bitrix24 sync scheduling failed",
-                extra={"bot_id": incoming_message.bot_id, "dialog_id": dialog.id, "error": str(exc)},
-            )
-
-        if _is_operator_mode_active(dialog, now):
-            return user_message, None, dialog, dialog_created
-
-        if operator_mode_elapsed and dialog.assigned_admin_id is not None:
-            dialog.is_locked = False
-            dialog.locked_until = None
-            dialog.assigned_admin_id = None
-            dialog.updated_at = datetime.utcnow()
-            session.add(dialog)
+        if _is_operator_mode_active(dialog, now) or (
+            dialog.assigned_admin_id is not None and dialog.locked_until is not None and dialog.locked_until > now
+        ):
             await session.commit()
-            await session.refresh(dialog)
-
-        if dialog.assigned_admin_id is not None and dialog.locked_until is not None and dialog.locked_until > now:
+            self._schedule_bitrix_sync(incoming_message, dialog_id=dialog.id, dialog_created=dialog_created)
             return user_message, None, dialog, dialog_created
 
+        # Read the bot in the same transaction, before the commit, so the AI call below can
+        # start while the user message is still being committed.
         bot = await self._get_bot(session=session, bot_id=incoming_message.bot_id)
         if bot.operator_handoff_enabled and _matches_operator_trigger(
             incoming_message.text or "", bot.operator_trigger_phrases
         ):
+            await session.commit()
+            self._schedule_bitrix_sync(incoming_message, dialog_id=dialog.id, dialog_created=dialog_created)
             system_message = await self._handoff_to_operator(
                 session=session,
                 dialog=dialog,
@@ -627,13 +827,25 @@ class DialogsService:
             )
             return user_message, system_message, dialog, dialog_created
 
-        bot_message: DialogMessage | None = None
-        try:
-            answer = await ai_service.answer(
+        # The AI service reads history through its own session and tolerates the user
+        # message being committed or not, so the LLM call overlaps with the commit.
+        ai_task = asyncio.create_task(
+            ai_service.answer(
                 bot_id=incoming_message.bot_id,
                 dialog_id=dialog.id,
                 question=incoming_message.text or "",
             )
+        )
+        try:
+            await session.commit()
+        except BaseException:
+            ai_task.cancel()
+            raise
+        self._schedule_bitrix_sync(incoming_message, dialog_id=dialog.id, dialog_created=dialog_created)
+
+        bot_message: DialogMessage | None = None
+        try:
+            answer = await ai_task
         except Exception:  # noqa: BLE001
             logger.exception(
                 "AI answer failed",
@@ -669,25 +881,23 @@ class DialogsService:
                 text=answer.answer,
             )
 
+            answered_at = datetime.utcnow()
             bot_response_time_seconds = (
-                int((datetime.utcnow() - dialog.last_user_message_at).total_seconds()) if dialog.last_user_message_at else 0
+                int((answered_at - dialog.last_user_message_at).total_seconds()) if dialog.last_user_message_at else 0
             )
             if not preserve_auto_status:
                 dialog.status = DialogStatus.WAIT_OPERATOR if operator_mode_elapsed else DialogStatus.WAIT_USER
-            dialog.updated_at = datetime.utcnow()
-            dialog.last_message_at = datetime.utcnow()
+            dialog.last_message_at = answered_at
             dialog.waiting_time_seconds = bot_response_time_seconds
             if not operator_mode_elapsed:
                 dialog.unread_messages_count = 0
 
-            session.add_all([dialog, bot_message])
-            await session.commit()
-            await session.refresh(dialog)
-            await session.refresh(bot_message)
-
-            sender_cls = get_sender(incoming_message.channel_type)
-            await sender_cls().send_text(
+            session.add(bot_message)
+            await self._commit_and_send(
+                session=session,
+                dialog_id=dialog.id,
                 bot_id=incoming_message.bot_id,
+                channel_type=incoming_message.channel_type,
                 external_chat_id=incoming_message.external_chat_id,
                 text=answer.answer,
             )
@@ -706,13 +916,13 @@ class DialogMessagesService:
             payload=obj_in.payload,
         )
         session.add(db_obj)
+        invalidate_dialog(obj_in.dialog_id)
         await session.commit()
         await session.refresh(db_obj)
         return db_obj
 
     async def get(self, session: AsyncSession, message_id: int) -> DialogMessage | None:
-        result = await session.execute(select(DialogMessage).where(DialogMessage.id == message_id))
-        return result.scalars().first()
+        return await session.get(DialogMessage, message_id)
 
     async def list(
         self,
@@ -730,13 +940,9 @@ class DialogMessagesService:
                     conditions.append(getattr(DialogMessage, field) == value)
 
         stmt = select(DialogMessage).where(*conditions).order_by(DialogMessage.created_at.asc())
-        total_result = await session.execute(
-            select(func.count()).select_from(select(DialogMessage.id).where(*conditions).subquery())
+        items, total = await _fetch_page_with_total(
+            session, stmt, DialogMessage.id, conditions, (page - 1) * per_page, per_page
         )
-        total = total_result.scalar_one()
-
-        result = await session.execute(stmt.offset((page - 1) * per_page).limit(per_page))
-        items = result.scalars().all()
         has_next = page * per_page < total
         return items, total, has_next
 
@@ -750,18 +956,61 @@ class DialogMessagesService:
 
         dialog_ids = list(set(dialog_ids))
 
-        stmt = (
-            select(DialogMessage)
-            .where(DialogMessage.dialog_id.in_(dialog_ids))
-            .distinct(DialogMessage.dialog_id)
-            .order_by(DialogMessage.dialog_id, DialogMessage.created_at.desc(), DialogMessage.id.desc())
+        position = (
+            func.row_number()
+            .over(
+                partition_by=DialogMessage.dialog_id,
+                order_by=(DialogMessage.created_at.desc(), DialogMessage.id.desc()),
+            )
+            .label("position")
         )
+        ranked = (
+            select(DialogMessage, position).where(DialogMessage.dialog_id.in_(dialog_ids)).subquery()
+        )
+        latest = aliased(DialogMessage, ranked)
+        stmt = select(latest).where(ranked.c.position == 1)
         result = await session.execute(stmt)
         messages = result.scalars().all()
         return {message.dialog_id: message for message in messages}
 
+    async def list_for_dialog(
+        self,
+        session: AsyncSession,
+        dialog_id: int,
+        cursor: str | None = None,
+        limit: int = 50,
+    ) -> tuple[list[DialogMessage], str | None]:
+        """Return a page of the newest messages older than ``cursor``, newest first.
+
+        Keyset pagination on ``(created_at, id)`` keeps every page an index range scan,
+        regardless of how deep the client has scrolled.
+        """
+
+        validate_pagination(1, limit)
+
+        stmt = select(DialogMessage).where(DialogMessage.dialog_id == dialog_id)
+        if cursor is not None:
+            cursor_created_at, cursor_id = _decode_message_cursor(cursor)
+            stmt = stmt.where(
+                or_(
+                    DialogMessage.created_at < cursor_created_at,
+                    and_(DialogMessage.created_at == cursor_created_at, DialogMessage.id < cursor_id),
+                )
+            )
+        stmt = (
+            stmt.order_by(DialogMessage.created_at.desc(), DialogMessage.id.desc())
+            .limit(limit + 1)
+            .options(selectinload(DialogMessage.operator_admin))
+        )
+
+        result = await session.execute(stmt)
+        items = list(result.scalars().all())
+        next_cursor = _encode_message_cursor(items[limit - 1]) if len(items) > limit else None
+        return items[:limit], next_cursor
+
     async def delete(self, session: AsyncSession, message_id: int) -> None:
         obj = await self.get(session, message_id)
         if obj:
+            invalidate_dialog(obj.dialog_id)
             await session.delete(obj)
             await session.commit()
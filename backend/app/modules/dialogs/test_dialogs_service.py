@@ -16,10 +16,11 @@ os.environ.setdefault("JWT_REFRESH_SECRET_KEY", "refresh" * 5)
 os.environ.setdefault("CHANNEL_CONFIG_SECRET_KEY", "secret")
 
 import pytest
-from sqlalchemy import create_engine, select
+from sqlalchemy import create_engine, event, false, select
 from sqlalchemy.dialects.postgresql import JSONB, dialect as postgresql_dialect
 from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from app.database import Base
 from app.modules.accounts.models import Account, User, UserRole, account_operators
@@ -29,13 +30,16 @@ from app.modules.bots.schemas import BotCreate, BotUpdate
 from app.modules.channels.models import ChannelType
 from app.modules.channels.schemas import NormalizedIncomingMessage
 from app.modules.dialogs.models import Dialog, DialogMessage, DialogStatus, MessageSender
+from app.modules.dialogs import request_cache
 from app.modules.dialogs.schemas import DialogCreate
 from app.modules.dialogs.service import (
     AI_CANNOT_ANSWER_TEXT,
     HANDOFF_TEXT,
     DialogLockError,
+    DialogMessagesService,
     DialogsService,
     _matches_operator_trigger,
+    _send_retry_tasks,
 )
 
 
@@ -56,14 +60,17 @@ class AsyncSessionWrapper:
     async def __aexit__(self, exc_type, exc, tb) -> None:  # noqa: D401, ANN001
         await self.close()
 
+    def __contains__(self, obj) -> bool:  # noqa: ANN001
+        return obj in self._session
+
     def add(self, obj) -> None:  # noqa: ANN001
         self._session.add(obj)
 
     def add_all(self, objs) -> None:  # noqa: ANN001
         self._session.add_all(objs)
 
-    async def execute(self, statement):  # noqa: ANN001
-        return self._session.execute(statement)
+    async def execute(self, statement, params=None):  # noqa: ANN001
+        return self._session.execute(statement, params)
 
     async def scalar(self, statement):  # noqa: ANN001
         return self._session.scalar(statement)
@@ -71,6 +78,12 @@ class AsyncSessionWrapper:
     async def get(self, entity, ident):  # noqa: ANN001
         return self._session.get(entity, ident)
 
+    def get_bind(self):  # noqa: ANN201
+        return self._session.get_bind()
+
+    async def flush(self) -> None:
+        self._session.flush()
+
     async def commit(self) -> None:
         self._session.commit()
 
@@ -84,45 +97,68 @@ class AsyncSessionWrapper:
         self._session.close()
 
 
-@pytest.fixture()
-def db_sessionmaker() -> Callable[[], AsyncSessionWrapper]:
-    engine = create_engine("sqlite:///:memory:", future=True)
-    Base.metadata.create_all(
-        bind=engine,
-        tables=[
-            User.__table__,
-            Account.__table__,
-            Bot.__table__,
-            Dialog.__table__,
-            DialogMessage.__table__,
-        ],
+_TEST_TABLES = [
+    User.__table__,
+    Account.__table__,
+    account_operators,
+    Bot.__table__,
+    BotAdmin.__table__,
+    Dialog.__table__,
+    DialogMessage.__table__,
+]
+
+
+@pytest.fixture(scope="session")
+def db_engine():
+    # StaticPool pins the single in-memory database, so the schema survives for the whole run.
+    engine = create_engine(
+        "sqlite:///:memory:",
+        future=True,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
     )
 
-    sync_sessionmaker = sessionmaker(bind=engine, expire_on_commit=False)
+    # pysqlite manages transactions itself and breaks SAVEPOINT handling; let SQLAlchemy emit BEGIN.
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, _connection_record):  # noqa: ANN001
+        dbapi_connection.isolation_level = None
 
-    def factory() -> AsyncSessionWrapper:
-        return AsyncSessionWrapper(sync_sessionmaker())
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):  # noqa: ANN001
+        conn.exec_driver_sql("BEGIN")
 
+    Base.metadata.create_all(bind=engine, tables=_TEST_TABLES)
     try:
-        yield factory
+        yield engine
     finally:
-        Base.metadata.drop_all(
-            bind=engine,
-            tables=[
-                DialogMessage.__table__,
-                Dialog.__table__,
-                BotAdmin.__table__,
-                Bot.__table__,
-                account_operators,
-                Account.__table__,
-                User.__table__,
-            ],
-        )
+        Base.metadata.drop_all(bind=engine, tables=list(reversed(_TEST_TABLES)))
         engine.dispose()
 
 
-def run(coro):
-    return asyncio.run(coro)
+@pytest.fixture()
+def db_sessionmaker(db_engine) -> Callable[[], AsyncSessionWrapper]:
+    """Sessions joined to an outer transaction that is rolled back after the test.
+
+    Each session wraps its work in a SAVEPOINT, so ``commit()`` inside a test only
+    releases the savepoint and the schema is created once per test run.
+    """
+
+    connection = db_engine.connect()
+    transaction = connection.begin()
+    sync_sessionmaker = sessionmaker(
+        bind=connection,
+        expire_on_commit=False,
+        join_transaction_mode="create_savepoint",
+    )
+
+    def factory() -> AsyncSessionWrapper:
+        return AsyncSessionWrapper(sync_sessionmaker())
+
+    try:
+        yield factory
+    finally:
+        transaction.rollback()
+        connection.close()
 
 
 def test_dialog_status_enum_uses_lowercase_values():
@@ -143,50 +179,54 @@ async def _create_base_entities(maker: Callable[[], AsyncSessionWrapper]):
         session.add_all([owner, account, bot, operator, another_operator])
         await session.commit()
 
-        await session.refresh(bot)
-        await session.refresh(operator)
-        await session.refresh(another_operator)
-
         return bot, operator, another_operator
 
 
+# Validated once; tests copy it with their own ids instead of re-validating the whole schema.
+_DIALOG_CREATE_TEMPLATE = DialogCreate(
+    bot_id=0,
+    channel_type=ChannelType.WEBCHAT,
+    external_chat_id="template",
+    external_user_id="user-template",
+    status=DialogStatus.AUTO,
+    closed=False,
+)
+
+
 async def _create_dialog(
     service: DialogsService, maker: Callable[[], AsyncSessionWrapper], bot: Bot, chat_id: str
 ):
     async with maker() as session:
         dialog = await service.create(
             session=session,
-            obj_in=DialogCreate(
-                bot_id=bot.id,
-                channel_type=ChannelType.WEBCHAT,
-                external_chat_id=chat_id,
-                external_user_id=f"user-{chat_id}",
-                status=DialogStatus.AUTO,
-                closed=False,
+            obj_in=_DIALOG_CREATE_TEMPLATE.model_copy(
+                update={"bot_id": bot.id, "external_chat_id": chat_id, "external_user_id": f"user-{chat_id}"}
             ),
         )
         return dialog
 
 
-def test_lock_dialog_sets_assignment_and_flag(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_lock_dialog_sets_assignment_and_flag(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
     service = DialogsService()
-    bot, operator, _ = run(_create_base_entities(db_sessionmaker))
-    dialog = run(_create_dialog(service, db_sessionmaker, bot, "lock-me"))
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
+    dialog = await _create_dialog(service, db_sessionmaker, bot, "lock-me")
 
     async def _lock_dialog():
         async with db_sessionmaker() as session:
             return await service.lock_dialog(session=session, dialog=dialog, admin_id=operator.id)
 
-    locked_dialog = run(_lock_dialog())
+    locked_dialog = await _lock_dialog()
     assert locked_dialog.is_locked is True
     assert locked_dialog.assigned_admin_id == operator.id
     assert locked_dialog.locked_until is None
 
 
-def test_lock_dialog_conflict_with_foreign_owner(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_lock_dialog_conflict_with_foreign_owner(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
     service = DialogsService()
-    bot, operator, another_operator = run(_create_base_entities(db_sessionmaker))
-    dialog = run(_create_dialog(service, db_sessionmaker, bot, "taken"))
+    bot, operator, another_operator = await _create_base_entities(db_sessionmaker)
+    dialog = await _create_dialog(service, db_sessionmaker, bot, "taken")
 
     async def _prepare_and_lock_with_other():
         async with db_sessionmaker() as session:
@@ -199,13 +239,14 @@ def test_lock_dialog_conflict_with_foreign_owner(db_sessionmaker: Callable[[], A
             with pytest.raises(DialogLockError):
                 await service.lock_dialog(session=session, dialog=dialog, admin_id=another_operator.id)
 
-    run(_prepare_and_lock_with_other())
+    await _prepare_and_lock_with_other()
 
 
-def test_unlock_dialog_requires_owner(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_unlock_dialog_requires_owner(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
     service = DialogsService()
-    bot, operator, another_operator = run(_create_base_entities(db_sessionmaker))
-    dialog = run(_create_dialog(service, db_sessionmaker, bot, "unlockable"))
+    bot, operator, another_operator = await _create_base_entities(db_sessionmaker)
+    dialog = await _create_dialog(service, db_sessionmaker, bot, "unlockable")
 
     async def _unlock_flow():
         async with db_sessionmaker() as session:
@@ -216,16 +257,17 @@ def test_unlock_dialog_requires_owner(db_sessionmaker: Callable[[], AsyncSession
 
             return await service.unlock_dialog(session=session, dialog=dialog_locked, admin_id=operator.id)
 
-    unlocked = run(_unlock_flow())
+    unlocked = await _unlock_flow()
     assert unlocked.is_locked is False
     assert unlocked.assigned_admin_id is None
 
 
-def test_list_filters_by_lock_state(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_list_filters_by_lock_state(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
     service = DialogsService()
-    bot, operator, _ = run(_create_base_entities(db_sessionmaker))
-    locked_dialog = run(_create_dialog(service, db_sessionmaker, bot, "locked"))
-    unlocked_dialog = run(_create_dialog(service, db_sessionmaker, bot, "unlocked"))
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
+    locked_dialog = await _create_dialog(service, db_sessionmaker, bot, "locked")
+    unlocked_dialog = await _create_dialog(service, db_sessionmaker, bot, "unlocked")
 
     async def _lock_and_list():
         async with db_sessionmaker() as session:
@@ -239,17 +281,203 @@ def test_list_filters_by_lock_state(db_sessionmaker: Callable[[], AsyncSessionWr
             )
             return locked_items, total_locked, unlocked_items, total_unlocked
 
-    locked_items, total_locked, unlocked_items, total_unlocked = run(_lock_and_list())
+    locked_items, total_locked, unlocked_items, total_unlocked = await _lock_and_list()
     assert {d.id for d in locked_items} == {locked_dialog.id}
     assert total_locked == 1
     assert {d.id for d in unlocked_items} == {unlocked_dialog.id}
     assert total_unlocked == 1
 
 
-def test_unlock_if_expired(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_list_reports_total_for_pages_past_the_end(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
     service = DialogsService()
-    bot, operator, _ = run(_create_base_entities(db_sessionmaker))
-    dialog = run(_create_dialog(service, db_sessionmaker, bot, "expire"))
+    bot, _, _ = await _create_base_entities(db_sessionmaker)
+    for index in range(3):
+        await _create_dialog(service, db_sessionmaker, bot, f"paged-{index}")
+
+    async def _list_pages():
+        async with db_sessionmaker() as session:
+            first = await service.list(session=session, filters={"bot_id": bot.id}, page=1, per_page=2)
+            beyond = await service.list(session=session, filters={"bot_id": bot.id}, page=5, per_page=2)
+            return first, beyond
+
+    (first_items, first_total, first_has_next), (beyond_items, beyond_total, beyond_has_next) = await _list_pages()
+    assert len(first_items) == 2
+    assert first_total == 3
+    assert first_has_next is True
+    assert beyond_items == []
+    assert beyond_total == 3
+    assert beyond_has_next is False
+
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_get_memoizes_dialog_per_request_until_modified(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
+    service = DialogsService()
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
+    dialog = await _create_dialog(service, db_sessionmaker, bot, "memoized")
+
+    async def _case():
+        token = request_cache._dialog_cache.set({})
+        try:
+            async with db_sessionmaker() as session:
+                executed = []
+                original_execute = session.execute
+
+                async def execute_spy(statement, params=None):
+                    executed.append(statement)
+                    return await original_execute(statement, params)
+
+                session.execute = execute_spy
+                first = await service.get(session=session, bot_id=bot.id, dialog_id=dialog.id, include_messages=True)
+                second = await service.get(session=session, bot_id=bot.id, dialog_id=dialog.id, include_messages=True)
+                queries_before_lock = len(executed)
+                await service.lock_dialog(session=session, dialog=first, admin_id=operator.id)
+                third = await service.get(session=session, bot_id=bot.id, dialog_id=dialog.id, include_messages=True)
+                return first, second, third, queries_before_lock, len(executed)
+        finally:
+            request_cache._dialog_cache.reset(token)
+
+    first, second, third, queries_before_lock, queries_total = await _case()
+    assert second is first
+    assert queries_before_lock == 1
+    assert queries_total == 2
+    assert third.is_locked is True
+
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_search_dialogs_matches_messages_without_duplicates(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
+    service = DialogsService()
+    bot, _, _ = await _create_base_entities(db_sessionmaker)
+    chatty = await _create_dialog(service, db_sessionmaker, bot, "search-chatty")
+    await _create_dialog(service, db_sessionmaker, bot, "search-quiet")
+    by_chat_id = await _create_dialog(service, db_sessionmaker, bot, "search-refund-chat")
+
+    async def _case():
+        async with db_sessionmaker() as session:
+            session.add_all(
+                [
+                    DialogMessage(dialog_id=chatty.id, sender=MessageSender.USER, text=f"Need a REFUND #{idx}")
+                    for idx in range(3)
+                ]
+            )
+            await session.commit()
+            return await service.search_dialogs(session=session, bot_id=bot.id, query="refund")
+
+    dialogs, total, has_next = await _case()
+    assert sorted(d.id for d in dialogs) == sorted([chatty.id, by_chat_id.id])
+    assert total == 2
+    assert has_next is False
+
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_get_many_fetches_dialogs_scoped_to_bot(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
+    service = DialogsService()
+    bot, _, _ = await _create_base_entities(db_sessionmaker)
+    first = await _create_dialog(service, db_sessionmaker, bot, "many-1")
+    second = await _create_dialog(service, db_sessionmaker, bot, "many-2")
+
+    async def _fetch():
+        async with db_sessionmaker() as session:
+            scoped = await service.get_many(session=session, bot_id=bot.id, dialog_ids=[first.id, second.id, 999])
+            foreign = await service.get_many(session=session, bot_id=bot.id + 1, dialog_ids=[first.id])
+            empty = await service.get_many(session=session, bot_id=None, dialog_ids=[])
+            return scoped, foreign, empty
+
+    scoped, foreign, empty = await _fetch()
+    assert set(scoped) == {first.id, second.id}
+    assert scoped[first.id].external_chat_id == "many-1"
+    assert foreign == {}
+    assert empty == {}
+
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_list_for_dialog_pages_newest_first_by_cursor(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
+    service = DialogsService()
+    messages_service = DialogMessagesService()
+    bot, _, _ = await _create_base_entities(db_sessionmaker)
+    dialog = await _create_dialog(service, db_sessionmaker, bot, "history")
+    base_time = datetime(2024, 1, 1, 12, 0, 0)
+
+    async def _seed():
+        async with db_sessionmaker() as session:
+            session.add_all(
+                [
+                    DialogMessage(
+                        dialog_id=dialog.id,
+                        sender=MessageSender.USER,
+                        text=f"m{idx}",
+                        created_at=base_time + timedelta(seconds=idx // 2),
+                    )
+                    for idx in range(5)
+                ]
+            )
+            await session.commit()
+
+    await _seed()
+
+    async def _page(cursor):
+        async with db_sessionmaker() as session:
+            return await messages_service.list_for_dialog(session=session, dialog_id=dialog.id, cursor=cursor, limit=2)
+
+    first, first_cursor = await _page(None)
+    second, second_cursor = await _page(first_cursor)
+    third, third_cursor = await _page(second_cursor)
+
+    assert [m.text for m in first] == ["m4", "m3"]
+    assert [m.text for m in second] == ["m2", "m1"]
+    assert [m.text for m in third] == ["m0"]
+    assert third_cursor is None
+
+    with pytest.raises(ValueError):
+        await _page("not-a-cursor")
+
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_get_last_messages_map_picks_newest_message_per_dialog(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
+    service = DialogsService()
+    messages_service = DialogMessagesService()
+    bot, _, _ = await _create_base_entities(db_sessionmaker)
+    first = await _create_dialog(service, db_sessionmaker, bot, "last-1")
+    second = await _create_dialog(service, db_sessionmaker, bot, "last-2")
+    empty = await _create_dialog(service, db_sessionmaker, bot, "last-empty")
+    base_time = datetime(2024, 1, 1, 12, 0, 0)
+
+    async def _case():
+        async with db_sessionmaker() as session:
+            session.add_all(
+                [
+                    DialogMessage(dialog_id=first.id, sender=MessageSender.USER, text="old", created_at=base_time),
+                    DialogMessage(
+                        dialog_id=first.id,
+                        sender=MessageSender.BOT,
+                        text="tie-low",
+                        created_at=base_time + timedelta(seconds=5),
+                    ),
+                    DialogMessage(
+                        dialog_id=first.id,
+                        sender=MessageSender.BOT,
+                        text="tie-high",
+                        created_at=base_time + timedelta(seconds=5),
+                    ),
+                    DialogMessage(dialog_id=second.id, sender=MessageSender.USER, text="only", created_at=base_time),
+                ]
+            )
+            await session.commit()
+            return await messages_service.get_last_messages_map(
+                session=session, dialog_ids=[first.id, second.id, empty.id, first.id]
+            )
+
+    last_messages = await _case()
+    assert set(last_messages) == {first.id, second.id}
+    assert last_messages[first.id].text == "tie-high"
+    assert last_messages[second.id].text == "only"
+
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_unlock_if_expired(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
+    service = DialogsService()
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
+    dialog = await _create_dialog(service, db_sessionmaker, bot, "expire")
 
     async def _lock_and_expire_dialog():
         async with db_sessionmaker() as session:
@@ -260,7 +488,7 @@ def test_unlock_if_expired(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
             await session.refresh(locked_dialog)
             return locked_dialog
 
-    run(_lock_and_expire_dialog())
+    await _lock_and_expire_dialog()
 
     async def _unlock_expired_dialog():
         async with db_sessionmaker() as session:
@@ -268,7 +496,7 @@ def test_unlock_if_expired(db_sessionmaker: Callable[[], AsyncSessionWrapper]):
             unlocked_dialog, unlocked = await service.unlock_if_expired(session=session, dialog=fetched_dialog)
             return unlocked_dialog, unlocked
 
-    unlocked_dialog, unlocked = run(_unlock_expired_dialog())
+    unlocked_dialog, unlocked = await _unlock_expired_dialog()
 
     assert unlocked is True
     assert unlocked_dialog.is_locked is False
@@ -297,6 +525,74 @@ class DummySender:
         self.sent.append((bot_id, external_chat_id, text))
 
 
+class _FailingCommitSession:
+    async def commit(self):
+        await asyncio.sleep(0)
+        raise RuntimeError("commit failed")
+
+
+class _OkCommitSession:
+    async def commit(self):
+        return None
+
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_commit_and_send_cancels_pending_send_when_commit_fails(monkeypatch):
+    send_started = asyncio.Event()
+    send_cancelled = asyncio.Event()
+
+    class _SlowSender:
+        async def send_text(self, **_kwargs):
+            send_started.set()
+            try:
+                await asyncio.sleep(3600)
+            except asyncio.CancelledError:
+                send_cancelled.set()
+                raise
+
+    monkeypatch.setattr("app.modules.dialogs.service.get_sender_instance", lambda _channel: _SlowSender())
+
+    with pytest.raises(RuntimeError, match="commit failed"):
+        await DialogsService()._commit_and_send(
+            session=_FailingCommitSession(),
+            dialog_id=1,
+            bot_id=1,
+            channel_type=ChannelType.WEBCHAT,
+            external_chat_id="chat-1",
+            text="hi",
+        )
+    await asyncio.sleep(0)
+
+    assert send_started.is_set()
+    assert send_cancelled.is_set()
+
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_commit_and_send_retries_failed_send(monkeypatch):
+    attempts: list[str] = []
+
+    class _FlakySender:
+        async def send_text(self, *, bot_id: int, external_chat_id: str, text: str):
+            attempts.append(text)
+            if len(attempts) == 1:
+                raise RuntimeError("channel down")
+
+    monkeypatch.setattr("app.modules.dialogs.service.get_sender_instance", lambda _channel: _FlakySender())
+    monkeypatch.setattr("app.modules.dialogs.service.SEND_RETRY_DELAY_SECONDS", 0)
+
+    await DialogsService()._commit_and_send(
+        session=_OkCommitSession(),
+        dialog_id=1,
+        bot_id=1,
+        channel_type=ChannelType.WEBCHAT,
+        external_chat_id="chat-1",
+        text="hi",
+    )
+    await asyncio.gather(*_send_retry_tasks)
+
+    assert attempts == ["hi", "hi"]
+
+
 def _incoming(bot_id: int, text: str) -> NormalizedIncomingMessage:
     return NormalizedIncomingMessage(
         bot_id=bot_id,
@@ -342,11 +638,12 @@ def test_operator_trigger_matching_normalizes_text():
     assert not _matches_operator_trigger("хочу менеджера", ["позовите оператора"])
 
 
-def test_process_incoming_handoff_trigger_skips_ai(db_sessionmaker, monkeypatch):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_process_incoming_handoff_trigger_skips_ai(db_sessionmaker, monkeypatch):
     DummySender.sent = []
-    monkeypatch.setattr("app.modules.dialogs.service.get_sender", lambda _channel: DummySender)
+    monkeypatch.setattr("app.modules.dialogs.service.get_sender_instance", lambda _channel: DummySender())
     service = DialogsService()
-    bot, _, _ = run(_create_base_entities(db_sessionmaker))
+    bot, _, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -362,18 +659,19 @@ def test_process_incoming_handoff_trigger_skips_ai(db_sessionmaker, monkeypatch)
             )
             return ai.calls, system, dialog
 
-    calls, system, dialog = run(_case())
+    calls, system, dialog = await _case()
     assert calls == 0
     assert dialog.status == DialogStatus.WAIT_OPERATOR
     assert system.text == HANDOFF_TEXT
     assert DummySender.sent == [(bot.id, "chat-1", HANDOFF_TEXT)]
 
 
-def test_process_incoming_handoff_off_trigger_uses_ai(db_sessionmaker, monkeypatch):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_process_incoming_handoff_off_trigger_uses_ai(db_sessionmaker, monkeypatch):
     DummySender.sent = []
-    monkeypatch.setattr("app.modules.dialogs.service.get_sender", lambda _channel: DummySender)
+    monkeypatch.setattr("app.modules.dialogs.service.get_sender_instance", lambda _channel: DummySender())
     service = DialogsService()
-    bot, _, _ = run(_create_base_entities(db_sessionmaker))
+    bot, _, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -389,17 +687,18 @@ def test_process_incoming_handoff_off_trigger_uses_ai(db_sessionmaker, monkeypat
             )
             return ai.calls, bot_message, dialog
 
-    calls, bot_message, dialog = run(_case())
+    calls, bot_message, dialog = await _case()
     assert calls == 1
     assert dialog.status == DialogStatus.WAIT_USER
     assert bot_message.text == "Ответ"
 
 
-def test_process_incoming_preserves_auto_status_after_ai_answer(db_sessionmaker, monkeypatch):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_process_incoming_preserves_auto_status_after_ai_answer(db_sessionmaker, monkeypatch):
     DummySender.sent = []
-    monkeypatch.setattr("app.modules.dialogs.service.get_sender", lambda _channel: DummySender)
+    monkeypatch.setattr("app.modules.dialogs.service.get_sender_instance", lambda _channel: DummySender())
     service = DialogsService()
-    bot, operator, _ = run(_create_base_entities(db_sessionmaker))
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -426,7 +725,7 @@ def test_process_incoming_preserves_auto_status_after_ai_answer(db_sessionmaker,
             )
             return ai.calls, bot_message, updated_dialog
 
-    calls, bot_message, dialog = run(_case())
+    calls, bot_message, dialog = await _case()
     assert calls == 1
     assert bot_message.text == "Автоответ"
     assert dialog.status == DialogStatus.AUTO
@@ -444,11 +743,12 @@ def test_process_incoming_preserves_auto_status_after_ai_answer(db_sessionmaker,
         (False, DummyAIService(exc=RuntimeError("ai unavailable")), DialogStatus.WAIT_USER, AI_CANNOT_ANSWER_TEXT),
     ],
 )
-def test_process_incoming_ai_fallback_respects_handoff(enabled, ai, expected_status, expected_text, db_sessionmaker, monkeypatch):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_process_incoming_ai_fallback_respects_handoff(enabled, ai, expected_status, expected_text, db_sessionmaker, monkeypatch):
     DummySender.sent = []
-    monkeypatch.setattr("app.modules.dialogs.service.get_sender", lambda _channel: DummySender)
+    monkeypatch.setattr("app.modules.dialogs.service.get_sender_instance", lambda _channel: DummySender())
     service = DialogsService()
-    bot, _, _ = run(_create_base_entities(db_sessionmaker))
+    bot, _, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -462,15 +762,16 @@ def test_process_incoming_ai_fallback_respects_handoff(enabled, ai, expected_sta
             )
             return message, dialog
 
-    message, dialog = run(_case())
+    message, dialog = await _case()
     assert dialog.status == expected_status
     assert message.text == expected_text
     assert DummySender.sent == [(bot.id, "chat-1", expected_text)]
 
 
-def test_process_incoming_locked_operator_priority_skips_ai(db_sessionmaker):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_process_incoming_locked_operator_priority_skips_ai(db_sessionmaker):
     service = DialogsService()
-    bot, operator, _ = run(_create_base_entities(db_sessionmaker))
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -494,15 +795,16 @@ def test_process_incoming_locked_operator_priority_skips_ai(db_sessionmaker):
             )
             return ai.calls, system, dialog
 
-    calls, system, dialog = run(_case())
+    calls, system, dialog = await _case()
     assert calls == 0
     assert system is None
     assert dialog.assigned_admin_id == operator.id
 
 
-def test_switch_to_auto_does_not_reprocess_last_trigger_message(db_sessionmaker):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_switch_to_auto_does_not_reprocess_last_trigger_message(db_sessionmaker):
     service = DialogsService()
-    bot, operator, _ = run(_create_base_entities(db_sessionmaker))
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -530,7 +832,7 @@ def test_switch_to_auto_does_not_reprocess_last_trigger_message(db_sessionmaker)
             after_count = (await session.execute(select(DialogMessage).where(DialogMessage.dialog_id == dialog.id))).scalars().all()
             return updated, len(before_count), len(after_count), dialog.id
 
-    dialog, before_count, after_count, original_id = run(_case())
+    dialog, before_count, after_count, original_id = await _case()
     assert dialog.id == original_id
     assert before_count == 1
     assert after_count == 1
@@ -543,43 +845,53 @@ def test_switch_to_auto_does_not_reprocess_last_trigger_message(db_sessionmaker)
 
 
 
-def test_get_or_create_dialog_locks_bot_before_open_dialog_lookup(db_sessionmaker):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_get_or_create_dialog_reuses_row_inserted_by_concurrent_creator(db_sessionmaker):
     service = DialogsService()
-    bot, _, _ = run(_create_base_entities(db_sessionmaker))
+    bot, _, _ = await _create_base_entities(db_sessionmaker)
+    existing = await _create_dialog(service, db_sessionmaker, bot, "get-or-create-race")
 
     async def _case():
         async with db_sessionmaker() as session:
-            scalar_statements = []
-            original_scalar = session.scalar
+            executed = []
+            original_execute = session.execute
 
-            async def scalar_spy(statement):
-                scalar_statements.append(statement)
-                return await original_scalar(statement)
+            async def execute_spy(statement, params=None):
+                executed.append(statement)
+                if len(executed) == 1:
+                    # Simulate losing the race: the first lookup runs before the other creator commits.
+                    statement = statement.where(false())
+                return await original_execute(statement, params)
 
-            session.scalar = scalar_spy
+            session.execute = execute_spy
             dialog, created = await service.get_or_create_dialog(
                 session=session,
                 bot_id=bot.id,
                 channel_type=ChannelType.WEBCHAT,
-                external_chat_id="get-or-create-lock",
-                external_user_id="get-or-create-lock-user",
+                external_chat_id="get-or-create-race",
+                external_user_id="get-or-create-race-user",
             )
-            return dialog, created, scalar_statements
-
-    dialog, created, scalar_statements = run(_case())
-    assert dialog.bot_id == bot.id
-    assert created is True
-    assert len(scalar_statements) == 1
+            open_dialogs = (
+                await original_execute(
+                    select(Dialog).where(
+                        Dialog.external_chat_id == "get-or-create-race",
+                        Dialog.closed.is_(False),
+                    )
+                )
+            ).scalars().all()
+            return dialog, created, executed, open_dialogs
+
+    dialog, created, executed, open_dialogs = await _case()
+    assert created is False
+    assert dialog.id == existing.id
+    assert len(open_dialogs) == 1
+    assert not any("FOR UPDATE" in str(statement) for statement in executed)
 
-    bot_lock_statement = scalar_statements[0]
-    compiled = str(bot_lock_statement.compile(dialect=postgresql_dialect()))
-    assert "FROM bots" in compiled
-    assert "WHERE bots.id" in compiled
-    assert "FOR UPDATE" in compiled
 
-def test_switch_to_auto_closed_dialog_locks_bot_before_duplicate_check(db_sessionmaker):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_switch_to_auto_closed_dialog_locks_bot_before_duplicate_check(db_sessionmaker):
     service = DialogsService()
-    bot, operator, _ = run(_create_base_entities(db_sessionmaker))
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -608,7 +920,7 @@ def test_switch_to_auto_closed_dialog_locks_bot_before_duplicate_check(db_sessio
             updated = await service.switch_to_auto(session=session, dialog=dialog, admin_id=operator.id)
             return updated, scalar_statements
 
-    dialog, scalar_statements = run(_case())
+    dialog, scalar_statements = await _case()
     assert dialog.status == DialogStatus.AUTO
     assert dialog.closed is False
     assert len(scalar_statements) >= 2
@@ -620,9 +932,10 @@ def test_switch_to_auto_closed_dialog_locks_bot_before_duplicate_check(db_sessio
     assert "FOR UPDATE" in compiled
 
 
-def test_switch_to_auto_open_dialog_does_not_lock_bot(db_sessionmaker):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_switch_to_auto_open_dialog_does_not_lock_bot(db_sessionmaker):
     service = DialogsService()
-    bot, operator, _ = run(_create_base_entities(db_sessionmaker))
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -650,14 +963,15 @@ def test_switch_to_auto_open_dialog_does_not_lock_bot(db_sessionmaker):
             updated = await service.switch_to_auto(session=session, dialog=dialog, admin_id=operator.id)
             return updated, scalar_statements
 
-    dialog, scalar_statements = run(_case())
+    dialog, scalar_statements = await _case()
     assert dialog.status == DialogStatus.AUTO
     assert dialog.closed is False
     assert scalar_statements == []
 
-def test_switch_to_auto_reopens_closed_dialog(db_sessionmaker):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_switch_to_auto_reopens_closed_dialog(db_sessionmaker):
     service = DialogsService()
-    bot, operator, _ = run(_create_base_entities(db_sessionmaker))
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -680,7 +994,7 @@ def test_switch_to_auto_reopens_closed_dialog(db_sessionmaker):
             updated = await service.switch_to_auto(session=session, dialog=dialog, admin_id=operator.id)
             return updated, original_id
 
-    dialog, original_id = run(_case())
+    dialog, original_id = await _case()
     assert dialog.id == original_id
     assert dialog.closed is False
     assert dialog.status == DialogStatus.AUTO
@@ -689,9 +1003,10 @@ def test_switch_to_auto_reopens_closed_dialog(db_sessionmaker):
     assert dialog.locked_until is None
 
 
-def test_switch_to_auto_rejects_reopen_when_another_active_dialog_exists(db_sessionmaker):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_switch_to_auto_rejects_reopen_when_another_active_dialog_exists(db_sessionmaker):
     service = DialogsService()
-    bot, operator, _ = run(_create_base_entities(db_sessionmaker))
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -725,7 +1040,7 @@ def test_switch_to_auto_rejects_reopen_when_another_active_dialog_exists(db_sess
             await session.refresh(active)
             return legacy, active
 
-    legacy, active = run(_case())
+    legacy, active = await _case()
     assert legacy.closed is True
     assert legacy.status == DialogStatus.WAIT_OPERATOR
     assert legacy.assigned_admin_id == operator.id
@@ -737,9 +1052,10 @@ def test_switch_to_auto_rejects_reopen_when_another_active_dialog_exists(db_sess
     assert active.is_locked is False
 
 
-def test_get_or_create_reuses_dialog_after_switch_to_auto(db_sessionmaker):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_get_or_create_reuses_dialog_after_switch_to_auto(db_sessionmaker):
     service = DialogsService()
-    bot, operator, _ = run(_create_base_entities(db_sessionmaker))
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -766,11 +1082,12 @@ def test_get_or_create_reuses_dialog_after_switch_to_auto(db_sessionmaker):
             )
             return updated.id, fetched.id, created
 
-    updated_id, fetched_id, created = run(_case())
+    updated_id, fetched_id, created = await _case()
     assert fetched_id == updated_id
     assert created is False
 
-def test_count_waiting_operator_dialogs_filters_status_closed_and_access(db_sessionmaker):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_count_waiting_operator_dialogs_filters_status_closed_and_access(db_sessionmaker):
     service = DialogsService()
 
     async def _case():
@@ -812,13 +1129,14 @@ def test_count_waiting_operator_dialogs_filters_status_closed_and_access(db_sess
             admin_count = await service.count_waiting_operator_dialogs(session=session, current_user=admin)
             return owner_count, operator_count, admin_count
 
-    owner_count, operator_count, admin_count = run(_case())
+    owner_count, operator_count, admin_count = await _case()
     assert owner_count == 1
     assert operator_count == 1
     assert admin_count == 3
 
 
-def test_count_waiting_operator_dialogs_excludes_assigned_dialogs(db_sessionmaker):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_count_waiting_operator_dialogs_excludes_assigned_dialogs(db_sessionmaker):
     service = DialogsService()
 
     async def _case():
@@ -857,10 +1175,11 @@ def test_count_waiting_operator_dialogs_excludes_assigned_dialogs(db_sessionmake
 
             return await service.count_waiting_operator_dialogs(session=session, current_user=owner)
 
-    assert run(_case()) == 1
+    assert await _case() == 1
 
 
-def test_count_waiting_operator_dialogs_returns_zero(db_sessionmaker):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_count_waiting_operator_dialogs_returns_zero(db_sessionmaker):
     service = DialogsService()
 
     async def _case():
@@ -873,14 +1192,15 @@ def test_count_waiting_operator_dialogs_returns_zero(db_sessionmaker):
             await session.refresh(user)
             return await service.count_waiting_operator_dialogs(session=session, current_user=user)
 
-    assert run(_case()) == 0
+    assert await _case() == 0
 
 
-def test_handoff_sets_operator_mode_and_blocks_ai_before_timeout(db_sessionmaker, monkeypatch):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_handoff_sets_operator_mode_and_blocks_ai_before_timeout(db_sessionmaker, monkeypatch):
     DummySender.sent = []
-    monkeypatch.setattr("app.modules.dialogs.service.get_sender", lambda _channel: DummySender)
+    monkeypatch.setattr("app.modules.dialogs.service.get_sender_instance", lambda _channel: DummySender())
     service = DialogsService()
-    bot, _, _ = run(_create_base_entities(db_sessionmaker))
+    bot, _, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -904,7 +1224,7 @@ def test_handoff_sets_operator_mode_and_blocks_ai_before_timeout(db_sessionmaker
             messages = (await session.execute(select(DialogMessage).where(DialogMessage.dialog_id == dialog.id))).scalars().all()
             return ai.calls, bot_message, dialog, started_at, messages
 
-    calls, bot_message, dialog, started_at, messages = run(_case())
+    calls, bot_message, dialog, started_at, messages = await _case()
     assert started_at is not None
     assert calls == 0
     assert bot_message is None
@@ -914,11 +1234,12 @@ def test_handoff_sets_operator_mode_and_blocks_ai_before_timeout(db_sessionmaker
     assert [message.sender for message in messages].count(MessageSender.BOT) == 1
 
 
-def test_legacy_wait_operator_without_operator_mode_date_starts_timer_and_skips_ai(db_sessionmaker, monkeypatch):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_legacy_wait_operator_without_operator_mode_date_starts_timer_and_skips_ai(db_sessionmaker, monkeypatch):
     DummySender.sent = []
-    monkeypatch.setattr("app.modules.dialogs.service.get_sender", lambda _channel: DummySender)
+    monkeypatch.setattr("app.modules.dialogs.service.get_sender_instance", lambda _channel: DummySender())
     service = DialogsService()
-    bot, operator, _ = run(_create_base_entities(db_sessionmaker))
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -975,7 +1296,7 @@ def test_legacy_wait_operator_without_operator_mode_date_starts_timer_and_skips_
         second_bot_message,
         dialog,
         messages,
-    ) = run(_case())
+    ) = await _case()
     assert user_message.sender == MessageSender.USER
     assert bot_message is None
     assert started_at is not None
@@ -990,11 +1311,12 @@ def test_legacy_wait_operator_without_operator_mode_date_starts_timer_and_skips_
     assert [message.sender for message in messages] == [MessageSender.USER, MessageSender.USER]
 
 
-def test_handoff_without_operator_answer_allows_ai_after_timeout_but_remains_waiting(db_sessionmaker, monkeypatch):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_handoff_without_operator_answer_allows_ai_after_timeout_but_remains_waiting(db_sessionmaker, monkeypatch):
     DummySender.sent = []
-    monkeypatch.setattr("app.modules.dialogs.service.get_sender", lambda _channel: DummySender)
+    monkeypatch.setattr("app.modules.dialogs.service.get_sender_instance", lambda _channel: DummySender())
     service = DialogsService()
-    bot, operator, _ = run(_create_base_entities(db_sessionmaker))
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -1023,7 +1345,7 @@ def test_handoff_without_operator_answer_allows_ai_after_timeout_but_remains_wai
             count = await service.count_waiting_operator_dialogs(session=session, current_user=owner)
             return ai.calls, bot_message, dialog, count
 
-    calls, bot_message, dialog, count = run(_case())
+    calls, bot_message, dialog, count = await _case()
     assert calls == 1
     assert bot_message.text == "timeout answer"
     assert dialog.status == DialogStatus.WAIT_OPERATOR
@@ -1034,11 +1356,12 @@ def test_handoff_without_operator_answer_allows_ai_after_timeout_but_remains_wai
     assert DummySender.sent == [(bot.id, "chat-1", "timeout answer")]
 
 
-def test_wait_user_ai_fallback_handoff_starts_operator_mode_and_blocks_next_message(db_sessionmaker, monkeypatch):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_wait_user_ai_fallback_handoff_starts_operator_mode_and_blocks_next_message(db_sessionmaker, monkeypatch):
     DummySender.sent = []
-    monkeypatch.setattr("app.modules.dialogs.service.get_sender", lambda _channel: DummySender)
+    monkeypatch.setattr("app.modules.dialogs.service.get_sender_instance", lambda _channel: DummySender())
     service = DialogsService()
-    bot, _, _ = run(_create_base_entities(db_sessionmaker))
+    bot, _, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -1096,7 +1419,7 @@ def test_wait_user_ai_fallback_handoff_starts_operator_mode_and_blocks_next_mess
         second_calls,
         dialog,
         messages,
-    ) = run(_case())
+    ) = await _case()
     assert user_message.sender == MessageSender.USER
     assert handoff_message.text == HANDOFF_TEXT
     assert first_calls == 1
@@ -1112,11 +1435,12 @@ def test_wait_user_ai_fallback_handoff_starts_operator_mode_and_blocks_next_mess
     assert DummySender.sent == [(bot.id, "chat-1", HANDOFF_TEXT)]
 
 
-def test_wait_user_trigger_handoff_starts_operator_mode_without_ai(db_sessionmaker, monkeypatch):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_wait_user_trigger_handoff_starts_operator_mode_without_ai(db_sessionmaker, monkeypatch):
     DummySender.sent = []
-    monkeypatch.setattr("app.modules.dialogs.service.get_sender", lambda _channel: DummySender)
+    monkeypatch.setattr("app.modules.dialogs.service.get_sender_instance", lambda _channel: DummySender())
     service = DialogsService()
-    bot, _, _ = run(_create_base_entities(db_sessionmaker))
+    bot, _, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -1143,7 +1467,7 @@ def test_wait_user_trigger_handoff_starts_operator_mode_without_ai(db_sessionmak
             )
             return user_message, handoff_message, ai.calls, dialog
 
-    user_message, handoff_message, calls, dialog = run(_case())
+    user_message, handoff_message, calls, dialog = await _case()
     assert user_message.sender == MessageSender.USER
     assert calls == 0
     assert handoff_message.text == HANDOFF_TEXT
@@ -1153,11 +1477,12 @@ def test_wait_user_trigger_handoff_starts_operator_mode_without_ai(db_sessionmak
     assert DummySender.sent == [(bot.id, "chat-1", HANDOFF_TEXT)]
 
 
-def test_operator_message_restarts_operator_mode_and_blocks_ai(db_sessionmaker, monkeypatch):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_operator_message_restarts_operator_mode_and_blocks_ai(db_sessionmaker, monkeypatch):
     DummySender.sent = []
-    monkeypatch.setattr("app.modules.dialogs.service.get_sender", lambda _channel: DummySender)
+    monkeypatch.setattr("app.modules.dialogs.service.get_sender_instance", lambda _channel: DummySender())
     service = DialogsService()
-    bot, operator, _ = run(_create_base_entities(db_sessionmaker))
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -1205,7 +1530,7 @@ def test_operator_message_restarts_operator_mode_and_blocks_ai(db_sessionmaker,
             )
             return ai.calls, bot_message, dialog, first_reply_at, second_reply_at
 
-    calls, bot_message, dialog, first_reply_at, second_reply_at = run(_case())
+    calls, bot_message, dialog, first_reply_at, second_reply_at = await _case()
     assert first_reply_at is not None
     assert second_reply_at is not None
     assert second_reply_at >= first_reply_at
@@ -1215,11 +1540,12 @@ def test_operator_message_restarts_operator_mode_and_blocks_ai(db_sessionmaker,
     assert dialog.assigned_admin_id == operator.id
 
 
-def test_user_messages_do_not_extend_operator_mode(db_sessionmaker, monkeypatch):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_user_messages_do_not_extend_operator_mode(db_sessionmaker, monkeypatch):
     DummySender.sent = []
-    monkeypatch.setattr("app.modules.dialogs.service.get_sender", lambda _channel: DummySender)
+    monkeypatch.setattr("app.modules.dialogs.service.get_sender_instance", lambda _channel: DummySender())
     service = DialogsService()
-    bot, _, _ = run(_create_base_entities(db_sessionmaker))
+    bot, _, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -1250,18 +1576,19 @@ def test_user_messages_do_not_extend_operator_mode(db_sessionmaker, monkeypatch)
             )
             return before_expiry, started_at, ai.calls, bot_message, dialog
 
-    before_expiry, started_at, calls, bot_message, dialog = run(_case())
+    before_expiry, started_at, calls, bot_message, dialog = await _case()
     assert before_expiry == started_at
     assert calls == 1
     assert bot_message.text == "ai"
     assert dialog.status == DialogStatus.WAIT_OPERATOR
 
 
-def test_switch_to_auto_clears_operator_mode_and_allows_ai_immediately(db_sessionmaker, monkeypatch):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_switch_to_auto_clears_operator_mode_and_allows_ai_immediately(db_sessionmaker, monkeypatch):
     DummySender.sent = []
-    monkeypatch.setattr("app.modules.dialogs.service.get_sender", lambda _channel: DummySender)
+    monkeypatch.setattr("app.modules.dialogs.service.get_sender_instance", lambda _channel: DummySender())
     service = DialogsService()
-    bot, operator, _ = run(_create_base_entities(db_sessionmaker))
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -1288,7 +1615,7 @@ def test_switch_to_auto_clears_operator_mode_and_allows_ai_immediately(db_sessio
             )
             return ai.calls, bot_message, dialog
 
-    calls, bot_message, dialog = run(_case())
+    calls, bot_message, dialog = await _case()
     assert calls == 1
     assert bot_message.text == "auto"
     assert dialog.status == DialogStatus.AUTO
@@ -1297,11 +1624,12 @@ def test_switch_to_auto_clears_operator_mode_and_allows_ai_immediately(db_sessio
     assert dialog.is_locked is False
 
 
-def test_ai_failure_after_operator_timeout_keeps_waiting_and_unread(db_sessionmaker, monkeypatch):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_ai_failure_after_operator_timeout_keeps_waiting_and_unread(db_sessionmaker, monkeypatch):
     DummySender.sent = []
-    monkeypatch.setattr("app.modules.dialogs.service.get_sender", lambda _channel: DummySender)
+    monkeypatch.setattr("app.modules.dialogs.service.get_sender_instance", lambda _channel: DummySender())
     service = DialogsService()
-    bot, operator, _ = run(_create_base_entities(db_sessionmaker))
+    bot, operator, _ = await _create_base_entities(db_sessionmaker)
 
     async def _case():
         async with db_sessionmaker() as session:
@@ -1329,7 +1657,7 @@ def test_ai_failure_after_operator_timeout_keeps_waiting_and_unread(db_sessionma
             )
             return ai.calls, message, dialog
 
-    calls, message, dialog = run(_case())
+    calls, message, dialog = await _case()
     assert calls == 1
     assert message.text == HANDOFF_TEXT
     assert dialog.status == DialogStatus.WAIT_OPERATOR
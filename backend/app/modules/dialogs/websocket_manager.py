@@ -1,12 +1,15 @@
 """WebSocket connection manager."""
 
+import asyncio
 import logging
 from collections import defaultdict
-from typing import DefaultDict, Iterable, Set, Tuple
+from typing import AbstractSet, DefaultDict, Dict, Iterable, Set
 
 from fastapi import WebSocket
 from starlette.websockets import WebSocketState
 
+from app.utils import json_codec
+
 
 logger = logging.getLogger(__name__)
 
@@ -14,13 +17,18 @@ logger = logging.getLogger(__name__)
 class WebSocketManager:
     def __init__(self) -> None:
         self._admin_connections: DefaultDict[int, Set[WebSocket]] = defaultdict(set)
-        self._webchat_connections: DefaultDict[Tuple[int, str], Set[WebSocket]] = defaultdict(set)
+        # Reverse index of every admin socket; its keys double as the "all admins" broadcast set.
+        self._admin_by_socket: Dict[WebSocket, int] = {}
+        # Webchat sockets indexed by bot_id, then by session id.
+        self._webchat_connections: DefaultDict[int, Dict[str, Set[WebSocket]]] = defaultdict(dict)
 
     async def register_admin(self, admin_id: int, ws: WebSocket) -> None:
         await ws.accept()
         self._admin_connections[admin_id].add(ws)
+        self._admin_by_socket[ws] = admin_id
 
     async def unregister_admin(self, admin_id: int, ws: WebSocket) -> None:
+        self._admin_by_socket.pop(ws, None)
         connections = self._admin_connections.get(admin_id)
         if not connections:
             return
@@ -33,30 +41,58 @@ class WebSocketManager:
         await self.broadcast_to_admins(admin_ids=[admin_id], message=message)
 
     async def broadcast_to_admins(self, message: dict, admin_ids: Iterable[int] | None = None) -> None:
-        target_admins = set(admin_ids) if admin_ids is not None else set(self._admin_connections.keys())
-        for admin_id in target_admins:
-            await self._broadcast_to_connections(self._admin_connections.get(admin_id, set()), message)
+        await self.broadcast_many([message], admin_ids=admin_ids)
+
+    async def broadcast_many(self, messages: list[dict], admin_ids: Iterable[int] | None = None) -> None:
+        """Send several events to admins, serializing each one once and keeping their order."""
+
+        disconnected = await self._send_frames(self._admin_sockets(admin_ids), messages)
+        self._discard_admin_sockets(disconnected)
+
+    def _admin_sockets(self, admin_ids: Iterable[int] | None) -> AbstractSet[WebSocket]:
+        if admin_ids is None:
+            return self._admin_by_socket.keys()
+        connected_admins = self._admin_connections.keys() & set(admin_ids)
+        return set().union(*(self._admin_connections[admin_id] for admin_id in connected_admins))
+
+    def _discard_admin_sockets(self, sockets: Iterable[WebSocket]) -> None:
+        for ws in sockets:
+            admin_id = self._admin_by_socket.pop(ws, None)
+            connections = self._admin_connections.get(admin_id) if admin_id is not None else None
+            if connections is None:
+                continue
+            connections.discard(ws)
+            if not connections:
+                self._admin_connections.pop(admin_id, None)
 
     async def register_webchat(self, bot_id: int, session_id: str, ws: WebSocket) -> None:
         await ws.accept()
-        self._webchat_connections[(bot_id, session_id)].add(ws)
+        self._webchat_connections[bot_id].setdefault(session_id, set()).add(ws)
 
     async def unregister_webchat(self, bot_id: int, session_id: str, ws: WebSocket) -> None:
-        key = (bot_id, session_id)
-        connections = self._webchat_connections.get(key)
-        if not connections:
-            return
-
-        connections.discard(ws)
-        if not connections:
-            self._webchat_connections.pop(key, None)
+        self._discard_webchat_sockets(bot_id, session_id, {ws})
 
     async def broadcast_to_webchat(self, bot_id: int, session_id: str, message: dict) -> None:
-        key = (bot_id, session_id)
-        connections = self._webchat_connections.get(key, set())
-        await self._broadcast_to_connections(connections, message)
+        await self.broadcast_many_to_webchat(bot_id=bot_id, session_id=session_id, messages=[message])
+
+    async def broadcast_many_to_webchat(self, bot_id: int, session_id: str, messages: list[dict]) -> None:
+        disconnected = await self._send_frames(self._webchat_sockets(bot_id, session_id), messages)
+        self._discard_webchat_sockets(bot_id, session_id, disconnected)
+
+    def _webchat_sockets(self, bot_id: int, session_id: str) -> Set[WebSocket]:
+        sessions = self._webchat_connections.get(bot_id)
+        return sessions.get(session_id, set()) if sessions else set()
+
+    def _discard_webchat_sockets(self, bot_id: int, session_id: str, sockets: Set[WebSocket]) -> None:
+        sessions = self._webchat_connections.get(bot_id)
+        connections = sessions.get(session_id) if sessions else None
+        if connections is None:
+            return
+        connections.difference_update(sockets)
         if not connections:
-            self._webchat_connections.pop(key, None)
+            del sessions[session_id]
+            if not sessions:
+                del self._webchat_connections[bot_id]
 
     async def send_to_webchat(self, bot_id: int, session_id: str, message: dict) -> None:
         await self.broadcast_to_webchat(bot_id=bot_id, session_id=session_id, message=message)
@@ -68,30 +104,43 @@ class WebSocketManager:
         message_payload: dict,
         admin_ids: Iterable[int] | None = None,
     ) -> None:
-        await self.broadcast_to_admins({"event": "message_created", "data": message_payload}, admin_ids=admin_ids)
-        await self.broadcast_to_admins({"event": "dialog_updated", "data": dialog_payload}, admin_ids=admin_ids)
-
-        await self.broadcast_to_webchat(
-            bot_id=dialog_payload["bot_id"],
-            session_id=dialog_payload["external_chat_id"],
-            message={"event": "message_created", "data": message_payload},
+        events = [
+            {"event": "message_created", "data": message_payload},
+            {"event": "dialog_updated", "data": dialog_payload},
+        ]
+        bot_id, session_id = dialog_payload["bot_id"], dialog_payload["external_chat_id"]
+        # One fan-out over admin and webchat sockets instead of a broadcast per audience.
+        disconnected = await self._send_frames(
+            self._admin_sockets(admin_ids) | self._webchat_sockets(bot_id, session_id),
+            events,
         )
-        await self.broadcast_to_webchat(
-            bot_id=dialog_payload["bot_id"],
-            session_id=dialog_payload["external_chat_id"],
-            message={"event": "dialog_updated", "data": dialog_payload},
+        self._discard_admin_sockets(disconnected)
+        self._discard_webchat_sockets(bot_id, session_id, disconnected)
+
+    async def _send_frames(self, sockets: Iterable[WebSocket], messages: list[dict]) -> Set[WebSocket]:
+        """Send ``messages`` to every socket and return the sockets that failed."""
+
+        # Snapshot the targets: sockets may register or unregister while the sends are awaited.
+        targets = tuple(sockets)
+        if not targets:
+            return set()
+        frames = [json_codec.dumps(message) for message in messages]
+
+        # Sockets are written concurrently; frames on a single socket keep their order.
+        # Closed sockets are detected by their failing send rather than a state check per socket.
+        results = await asyncio.gather(
+            *(self._send_to_socket(ws, messages, frames) for ws in targets), return_exceptions=True
         )
+        return {ws for ws, result in zip(targets, results) if result is not True}
 
-    async def _broadcast_to_connections(self, connections: Set[WebSocket], message: dict) -> None:
-        disconnected: Set[WebSocket] = set()
-
-        for ws in connections:
-            if ws.application_state != WebSocketState.CONNECTED:
-                disconnected.add(ws)
-                continue
+    @staticmethod
+    async def _send_to_socket(ws: WebSocket, messages: list[dict], frames: list[str]) -> bool:
+        for message, frame in zip(messages, frames):
             try:
-                await ws.send_json(message)
+                await ws.send_text(frame)
             except Exception:
+                if ws.application_state != WebSocketState.CONNECTED:
+                    return False
                 logger.exception(
                     "Failed to send websocket message",
                     extra={
@@ -99,10 +148,8 @@ class WebSocketManager:
                         "type": message.get("type"),
                     },
                 )
-                disconnected.add(ws)
-
-        for ws in disconnected:
-            connections.discard(ws)
+                return False
+        return True
 
 
 manager = WebSocketManager()
@@ -2,14 +2,10 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, UniqueConstraint, func, true
+from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, UniqueConstraint, true
 from sqlalchemy.orm import Mapped, mapped_column
 
-from app.database import Base
-
-
-def utcnow() -> datetime:
-    return datetime.utcnow()
+from app.database import Base, server_utcnow
 
 
 class BitrixIntegration(Base):
@@ -33,17 +29,13 @@ class BitrixIntegration(Base):
     enabled: Mapped[bool] = mapped_column(
         Boolean, nullable=False, default=True, server_default=true()
     )
-    created_at: Mapped[datetime] = mapped_column(
-        DateTime, default=utcnow, server_default=func.now(), nullable=False
-    )
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=server_utcnow(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime,
-        default=utcnow,
-        onupdate=utcnow,
-        server_default=func.now(),
-        nullable=False,
+        DateTime, server_default=server_utcnow(), onupdate=server_utcnow(), nullable=False
     )
 
+    __mapper_args__ = {"eager_defaults": True}
+
 
 class BitrixDialogLink(Base):
     __tablename__ = "bitrix_dialog_links"
@@ -56,13 +48,9 @@ class BitrixDialogLink(Base):
     bot_id: Mapped[int] = mapped_column(Integer, ForeignKey("bots.id", ondelete="CASCADE"), nullable=False)
     bitrix_chat_id: Mapped[str | None] = mapped_column(String(255), nullable=True)
     bitrix_lead_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
-    created_at: Mapped[datetime] = mapped_column(
-        DateTime, default=utcnow, server_default=func.now(), nullable=False
-    )
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=server_utcnow(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime,
-        default=utcnow,
-        onupdate=utcnow,
-        server_default=func.now(),
-        nullable=False,
+        DateTime, server_default=server_utcnow(), onupdate=server_utcnow(), nullable=False
     )
+
+    __mapper_args__ = {"eager_defaults": True}
@@ -1,20 +1,26 @@
 from __future__ import annotations
 
 import hmac
-import json
 import logging
-from datetime import UTC, datetime, timedelta
-from urllib.parse import urlparse
-
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+import re
+from collections.abc import Iterable
+from datetime import timedelta
+from functools import lru_cache
+from typing import Any
+from urllib.parse import parse_qsl, urlparse
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, status
 from fastapi.responses import RedirectResponse
-from sqlalchemy import select
+from sqlalchemy import bindparam, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
+from app.database import server_utcnow
 from app.dependencies import get_db_session, require_bot_access
 from app.modules.accounts.models import User
-from app.modules.channels.sender_registry import get_sender
+from app.modules.channels.models import ChannelType
+from app.modules.channels.sender_registry import get_sender_instance
 from app.modules.dialogs.models import Dialog, MessageSender
 from app.modules.dialogs.schemas import DialogMessageOut, DialogOut
 from app.modules.dialogs.service import DialogsService
@@ -31,23 +37,39 @@ from app.modules.integrations.bitrix24.schemas import (
 from app.modules.integrations.bitrix24.service import (
     Bitrix24Service,
     BitrixIntegrationError,
+    get_bitrix24_service,
+    utcnow_naive,
 )
 from app.security.auth import get_current_user
+from app.utils import json_codec
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/integrations/bitrix24", tags=["integrations"])
 
 
+@lru_cache(maxsize=1)
+def _expected_application_token() -> bytes:
+    # compare_digest on bytes accepts any token; on str it rejects non-ASCII input with TypeError.
+    return settings.bitrix24_app_application_token.encode()
+
+
 def _extract_dialog_id(raw: str | int | None) -> int | None:
     if raw is None:
         return None
-    normalized = str(raw).strip()
-    for prefix in ("dialog:", "chat:"):
-        if normalized.startswith(prefix):
-            normalized = normalized[len(prefix) :]
+    # JSON payloads usually carry the id as a plain int; skip the string round trip for those.
+    if isinstance(raw, int) and not isinstance(raw, bool):
+        return raw if raw >= 0 else None
+    normalized = str(raw).strip().removeprefix("dialog:").removeprefix("chat:")
     return int(normalized) if normalized.isdigit() else None
 
 
+@lru_cache(maxsize=1024)
+def _url_host(url: str) -> str:
+    """Lower-cased network location of ``url``; portals repeat across webhooks, so results are cached."""
+
+    return urlparse(url).netloc.lower()
+
+
 def _extract_hosts_from_auth(auth: dict) -> list[str]:
     hosts: list[str] = []
     for key in ("domain", "server_domain"):
@@ -57,13 +79,110 @@ def _extract_hosts_from_auth(auth: dict) -> list[str]:
     for key in ("client_endpoint", "server_endpoint"):
         endpoint = auth.get(key)
         if endpoint:
-            parsed = urlparse(str(endpoint))
-            if parsed.netloc:
-                hosts.append(parsed.netloc.lower())
+            hosts.append(_url_host(str(endpoint)))
     return [host for host in hosts if host]
 
 
-async def _resolve_dialog_for_event(session: AsyncSession, payload: BitrixEventPayload) -> Dialog | None:
+_FORM_KEY_SEGMENT_RE = re.compile(r"\[([^\]]+)\]")
+
+# data[...] form fields that bitrix_events reads; everything else is dropped.
+_SUPPORTED_DATA_PATHS: frozenset[tuple[str, ...]] = frozenset(
+    {
+        ("message", "text"),
+        ("text",),
+        ("chat", "id"),
+        ("chat_id",),
+        ("user", "id"),
+        ("dialog_id",),
+    }
+)
+
+
+def _set_nested(target: dict, path: tuple[str, ...], value: str) -> None:
+    cursor = target
+    for key in path[:-1]:
+        nested = cursor.get(key)
+        if not isinstance(nested, dict):
+            nested = {}
+            cursor[key] = nested
+        cursor = nested
+    cursor[path[-1]] = value
+
+
+def _load_json_dict(value: str) -> dict:
+    try:
+        parsed = json_codec.loads(value)
+    except Exception:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def _form_event(value: str, payload: dict, _auth: dict[str, str], _data: dict) -> None:
+    payload["event"] = value
+
+
+def _form_auth(value: str, _payload: dict, auth: dict[str, str], _data: dict) -> None:
+    auth.update({str(k): str(v) for k, v in _load_json_dict(value).items()})
+
+
+def _form_data(value: str, _payload: dict, _auth: dict[str, str], data: dict) -> None:
+    data.update(_load_json_dict(value))
+
+
+_FORM_FIELD_HANDLERS = {"event": _form_event, "auth": _form_auth, "data": _form_data}
+
+
+def _parse_form_payload(form_items: Iterable[tuple[str, Any]]) -> dict:
+    """Rebuild the event payload from Bitrix24's form-encoded webhook fields."""
+
+    payload: dict = {}
+    auth: dict[str, str] = {}
+    data: dict = {}
+
+    for key, value in form_items:
+        value_str = str(value)
+
+        handler = _FORM_FIELD_HANDLERS.get(key)
+        if handler is not None:
+            handler(value_str, payload, auth, data)
+            continue
+
+        prefix = key[:5]
+        if prefix == "auth[":
+            auth_key = key[5:-1]
+            if auth_key and key[-1] == "]":
+                auth[auth_key] = value_str
+        elif prefix == "data[":
+            path = tuple(_FORM_KEY_SEGMENT_RE.findall(key, 4))
+            if path in _SUPPORTED_DATA_PATHS:
+                _set_nested(data, path, value_str)
+
+    if auth:
+        payload["auth"] = auth
+    if data:
+        payload["data"] = data
+    return payload
+
+
+# Webhook lookups are built once with bound parameters so every request reuses the same cached statement.
+# The integration is joined in so that resolving the dialog and authorizing the event share a round trip.
+_DIALOG_WITH_INTEGRATION_STMT = select(Dialog, BitrixIntegration).outerjoin(
+    BitrixIntegration, BitrixIntegration.bot_id == Dialog.bot_id
+)
+_DIALOG_WITH_INTEGRATION_BY_ID_STMT = _DIALOG_WITH_INTEGRATION_STMT.where(Dialog.id == bindparam("dialog_id"))
+_DIALOGS_WITH_INTEGRATION_BY_IDS_STMT = _DIALOG_WITH_INTEGRATION_STMT.where(
+    Dialog.id.in_(bindparam("dialog_ids", expanding=True))
+)
+_DIALOG_WITH_INTEGRATION_BY_CHAT_STMT = _DIALOG_WITH_INTEGRATION_STMT.join(
+    BitrixDialogLink, BitrixDialogLink.dialog_id == Dialog.id
+).where(BitrixDialogLink.bitrix_chat_id == bindparam("bitrix_chat_id"))
+
+
+async def _resolve_dialog_for_event(
+    session: AsyncSession, payload: BitrixEventPayload
+) -> tuple[Dialog, BitrixIntegration | None] | None:
+    """Find the dialog an event refers to, together with its bot's Bitrix24 integration."""
+
     data = payload.data or {}
 
     user_info = data.get("user") if isinstance(data.get("user"), dict) else {}
@@ -76,26 +195,23 @@ async def _resolve_dialog_for_event(session: AsyncSession, payload: BitrixEventP
         data.get("chat", {}).get("id") if isinstance(data.get("chat"), dict) else None,
     ]
 
-    for candidate in dialog_id_candidates:
-        dialog_id = _extract_dialog_id(candidate)
-        if dialog_id is None:
-            continue
-        result = await session.execute(select(Dialog).where(Dialog.id == dialog_id))
-        dialog = result.scalars().first()
-        if dialog:
-            return dialog
+    dialog_ids = [
+        dialog_id for dialog_id in map(_extract_dialog_id, dialog_id_candidates) if dialog_id is not None
+    ]
+    if dialog_ids:
+        result = await session.execute(_DIALOGS_WITH_INTEGRATION_BY_IDS_STMT, {"dialog_ids": list(set(dialog_ids))})
+        rows_by_id = {dialog.id: (dialog, integration) for dialog, integration in result.tuples()}
+        # Candidates are ordered by priority, so keep the first one that exists.
+        for dialog_id in dialog_ids:
+            if dialog_id in rows_by_id:
+                return rows_by_id[dialog_id]
 
     bitrix_chat_id = data.get("chat_id") or chat_info.get("id")
     if bitrix_chat_id is None:
         return None
 
-    link_result = await session.execute(select(BitrixDialogLink).where(BitrixDialogLink.bitrix_chat_id == str(bitrix_chat_id)))
-    link = link_result.scalars().first()
-    if not link:
-        return None
-
-    result = await session.execute(select(Dialog).where(Dialog.id == link.dialog_id))
-    return result.scalars().first()
+    result = await session.execute(_DIALOG_WITH_INTEGRATION_BY_CHAT_STMT, {"bitrix_chat_id": str(bitrix_chat_id)})
+    return result.tuples().first()
 
 
 @router.post("/connect", response_model=BitrixConnectResponse)
@@ -103,7 +219,7 @@ async def connect_bitrix24(
     payload: BitrixConnectRequest,
     session: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
-    bitrix_service: Bitrix24Service = Depends(Bitrix24Service),
+    bitrix_service: Bitrix24Service = Depends(get_bitrix24_service),
 ) -> BitrixConnectResponse:
     await require_bot_access(payload.bot_id, session, current_user)
 
@@ -132,7 +248,7 @@ async def bitrix_oauth_callback(
     code: str | None = Query(default=None),
     state: str | None = Query(default=None),
     session: AsyncSession = Depends(get_db_session),
-    bitrix_service: Bitrix24Service = Depends(Bitrix24Service),
+    bitrix_service: Bitrix24Service = Depends(get_bitrix24_service),
 ) -> RedirectResponse:
     if not code or not state:
         raise HTTPException(
@@ -159,22 +275,25 @@ async def bitrix_oauth_callback(
     except BitrixIntegrationError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
-    result = await session.execute(select(BitrixIntegration).where(BitrixIntegration.bot_id == bot_id))
-    integration = result.scalars().first()
-    if not integration:
-        integration = BitrixIntegration(bot_id=bot_id, portal_url=portal_url)
-
     expires_in = int(token_data.get("expires_in", 3600))
-    integration.portal_url = portal_url
-    integration.member_id = token_data.get("member_id")
-    integration.access_token = token_data.get("access_token")
-    integration.refresh_token = token_data.get("refresh_token")
-    integration.expires_at = datetime.now(UTC).replace(tzinfo=None) + timedelta(seconds=expires_in - 30)
-    integration.scope = token_data.get("scope")
-    integration.enabled = True
-    integration.updated_at = datetime.now(UTC).replace(tzinfo=None)
-
-    session.add(integration)
+    values = {
+        "portal_url": portal_url,
+        "member_id": token_data.get("member_id"),
+        "access_token": token_data.get("access_token"),
+        "refresh_token": token_data.get("refresh_token"),
+        "expires_at": utcnow_naive() + timedelta(seconds=expires_in - 30),
+        "scope": token_data.get("scope"),
+        "enabled": True,
+    }
+    # Upsert on the bot_id unique constraint so concurrent callbacks cannot race into duplicates.
+    await session.execute(
+        postgresql_insert(BitrixIntegration)
+        .values(bot_id=bot_id, **values)
+        .on_conflict_do_update(
+            index_elements=[BitrixIntegration.bot_id],
+            set_={**values, "updated_at": server_utcnow()},
+        )
+    )
     await session.commit()
 
     frontend_base = settings.frontend_base_url or "http://localhost:3000"
@@ -186,7 +305,7 @@ async def bitrix_status(
     bot_id: int,
     session: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
-    bitrix_service: Bitrix24Service = Depends(Bitrix24Service),
+    bitrix_service: Bitrix24Service = Depends(get_bitrix24_service),
 ) -> BitrixStatusResponse:
     await require_bot_access(bot_id, session, current_user)
     integration = await bitrix_service.get_integration(session=session, bot_id=bot_id)
@@ -212,7 +331,7 @@ async def disconnect_bitrix24(
     payload: BitrixDisconnectRequest,
     session: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
-    bitrix_service: Bitrix24Service = Depends(Bitrix24Service),
+    bitrix_service: Bitrix24Service = Depends(get_bitrix24_service),
 ) -> BitrixStatusResponse:
     await require_bot_access(payload.bot_id, session, current_user)
     integration = await bitrix_service.get_integration(session=session, bot_id=payload.bot_id)
@@ -236,7 +355,7 @@ async def update_bitrix24_settings(
     payload: BitrixSettingsUpdateRequest,
     session: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
-    bitrix_service: Bitrix24Service = Depends(Bitrix24Service),
+    bitrix_service: Bitrix24Service = Depends(get_bitrix24_service),
 ) -> BitrixStatusResponse:
     await require_bot_access(payload.bot_id, session, current_user)
     integration = await bitrix_service.get_integration(session=session, bot_id=payload.bot_id)
@@ -265,16 +384,16 @@ async def create_lead_for_dialog(
     dialog_id: int,
     session: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
-    bitrix_service: Bitrix24Service = Depends(Bitrix24Service),
+    bitrix_service: Bitrix24Service = Depends(get_bitrix24_service),
 ) -> dict:
-    dialog_result = await session.execute(select(Dialog).where(Dialog.id == dialog_id))
-    dialog = dialog_result.scalars().first()
-    if not dialog:
+    row = (await session.execute(_DIALOG_WITH_INTEGRATION_BY_ID_STMT, {"dialog_id": dialog_id})).first()
+    if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dialog not found")
+    dialog, integration = row
 
     await require_bot_access(dialog.bot_id, session, current_user)
 
-    integration = await bitrix_service.ensure_active_integration(session=session, bot_id=dialog.bot_id)
+    integration = await bitrix_service.ensure_active(session=session, integration=integration)
     if not integration:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -292,17 +411,29 @@ async def create_lead_for_dialog(
 @router.post("/events")
 async def bitrix_events(
     request: Request,
+    background_tasks: BackgroundTasks,
     session: AsyncSession = Depends(get_db_session),
     dialogs_service: DialogsService = Depends(DialogsService),
-    bitrix_service: Bitrix24Service = Depends(Bitrix24Service),
 ) -> dict[str, str]:
+    if not settings.bitrix24_app_application_token:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Bitrix24 webhook не настроен",
+        )
+
+    body = await request.body()
     payload_dict: dict | None = None
-    try:
-        parsed_json = await request.json()
-        if isinstance(parsed_json, dict):
-            payload_dict = parsed_json
-    except Exception:
-        payload_dict = None
+    if request.headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
+        # Bitrix24 posts url-encoded forms; the body is already buffered, so split it directly
+        # instead of running it through the streaming form parser a second time.
+        payload_dict = _parse_form_payload(parse_qsl(body.decode("utf-8", "replace"), keep_blank_values=True))
+    else:
+        try:
+            parsed_json = json_codec.loads(body)
+            if isinstance(parsed_json, dict):
+                payload_dict = parsed_json
+        except Exception:
+            payload_dict = None
 
     if payload_dict is None:
         try:
@@ -310,131 +441,60 @@ async def bitrix_events(
         except Exception:
             form_data = None
 
-        payload_dict = {}
-        auth_dict: dict[str, str] = {}
-        data_dict: dict = {}
-
-        def set_nested(target: dict, path: list[str], value: str) -> None:
-            if not path:
-                return
-            cursor = target
-            for key in path[:-1]:
-                nested = cursor.get(key)
-                if not isinstance(nested, dict):
-                    nested = {}
-                    cursor[key] = nested
-                cursor = nested
-            cursor[path[-1]] = value
-
-        if form_data is not None:
-            for key, value in form_data.multi_items():
-                value_str = str(value)
-
-                if key == "event":
-                    payload_dict["event"] = value_str
-                    continue
-
-                if key == "auth":
-                    try:
-                        parsed_auth = json.loads(value_str)
-                        if isinstance(parsed_auth, dict):
-                            auth_dict.update({str(k): str(v) for k, v in parsed_auth.items()})
-                    except Exception:
-                        pass
-                    continue
-
-                if key.startswith("auth[") and key.endswith("]"):
-                    auth_key = key[5:-1]
-                    if auth_key:
-                        auth_dict[auth_key] = value_str
-                    continue
-
-                if key == "data":
-                    try:
-                        parsed_data = json.loads(value_str)
-                        if isinstance(parsed_data, dict):
-                            data_dict.update(parsed_data)
-                    except Exception:
-                        pass
-                    continue
-
-                if key.startswith("data["):
-                    path = [segment for segment in key[5:].replace("]", "").split("[") if segment]
-                    if not path:
-                        continue
-                    supported_paths = {
-                        ("message", "text"),
-                        ("text",),
-                        ("chat", "id"),
-                        ("chat_id",),
-                        ("user", "id"),
-                        ("dialog_id",),
-                    }
-                    if tuple(path) in supported_paths:
-                        set_nested(data_dict, path, value_str)
-
-        if auth_dict:
-            payload_dict["auth"] = auth_dict
-        if data_dict:
-            payload_dict["data"] = data_dict
-
-    event = payload_dict.get("event") if isinstance(payload_dict, dict) else None
-    data = payload_dict.get("data") if isinstance(payload_dict, dict) else None
-    auth = payload_dict.get("auth") if isinstance(payload_dict, dict) else None
+        payload_dict = _parse_form_payload(form_data.multi_items()) if form_data is not None else {}
 
-    if isinstance(data, str):
-        try:
-            data = json.loads(data)
-        except Exception:
-            data = None
+    event = payload_dict.get("event")
+    auth = payload_dict.get("auth")
 
     if isinstance(auth, str):
         try:
-            auth = json.loads(auth)
+            auth = json_codec.loads(auth)
         except Exception:
             auth = None
+    if not isinstance(auth, dict):
+        auth = {}
 
-    if data is not None and not isinstance(data, dict):
-        data = None
-    if auth is not None and not isinstance(auth, dict):
-        auth = None
-
-    payload = BitrixEventPayload(event=event, data=data, auth=auth)
-
-    if not settings.bitrix24_app_application_token:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Bitrix24 webhook не настроен",
-        )
-
-    auth = payload.auth or {}
-    application_token = str(auth.get("application_token") or "")
-    if not application_token or not hmac.compare_digest(application_token, settings.bitrix24_app_application_token):
+    application_token = str(auth.get("application_token") or "").encode()
+    if not application_token or not hmac.compare_digest(application_token, _expected_application_token()):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
 
-    event_name = (payload.event or "").lower()
+    # Only message events need the payload data and database lookups; drop the rest right after auth.
+    event_name = (event if isinstance(event, str) else "").lower()
     if "message" not in event_name:
         return {"status": "ignored"}
 
-    dialog = await _resolve_dialog_for_event(session=session, payload=payload)
-    if not dialog:
+    data = payload_dict.get("data")
+    if isinstance(data, str):
+        try:
+            data = json_codec.loads(data)
+        except Exception:
+            data = None
+    if data is not None and not isinstance(data, dict):
+        data = None
+
+    # Every field has already been type-checked above, so skip revalidating them.
+    payload = BitrixEventPayload.model_construct(event=event, data=data, auth=auth)
+
+    resolved = await _resolve_dialog_for_event(session=session, payload=payload)
+    if not resolved:
         return {"status": "ignored"}
 
-    integration = await bitrix_service.get_integration(session=session, bot_id=dialog.bot_id)
+    dialog, integration = resolved
     if not integration or not integration.enabled:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
 
     auth_member_id = auth.get("member_id")
     if integration.member_id:
-        if not auth_member_id or not hmac.compare_digest(str(auth_member_id), str(integration.member_id)):
+        if not auth_member_id or not hmac.compare_digest(str(auth_member_id).encode(), str(integration.member_id).encode()):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
     else:
-        integration_host = (urlparse(integration.portal_url).netloc or "").lower()
+        integration_host = _url_host(integration.portal_url)
         auth_hosts = _extract_hosts_from_auth(auth)
         if not integration_host or not auth_hosts:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
-        host_match = any(hmac.compare_digest(host, integration_host) for host in auth_hosts)
-        if not host_match:
+        # The portal host is public, so a plain membership test is enough; the application token and
+        # member_id above are the secrets and keep their constant-time comparisons.
+        if integration_host not in auth_hosts:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
 
     data = payload.data or {}
@@ -454,32 +514,58 @@ async def bitrix_events(
         payload={"source": "bitrix24"},
     )
 
-    sender_cls = get_sender(dialog.channel_type)
-    await sender_cls().send_text(
+    dialog_payload = DialogOut.model_validate(updated_dialog).model_dump(mode="json")
+    message_payload = DialogMessageOut.model_validate(message).model_dump(mode="json")
+    admin_targets = [updated_dialog.assigned_admin_id] if updated_dialog.assigned_admin_id is not None else None
+
+    # The reply is stored before responding; Bitrix24 retries slow webhooks, so only the outbound
+    # channel send and the websocket fan-out run after the response.
+    background_tasks.add_task(
+        _deliver_operator_message,
+        dialog_id=dialog.id,
         bot_id=dialog.bot_id,
+        channel_type=dialog.channel_type,
         external_chat_id=dialog.external_chat_id,
         text=text,
+        event_name=event_name,
+        dialog_payload=dialog_payload,
+        message_payload=message_payload,
+        admin_ids=admin_targets,
     )
+    return {"status": "accepted"}
 
-    dialog_payload = DialogOut.model_validate(updated_dialog).model_dump(mode="json")
-    message_payload = DialogMessageOut.model_validate(message).model_dump(mode="json")
-    admin_targets = [updated_dialog.assigned_admin_id] if updated_dialog.assigned_admin_id is not None else None
 
-    await manager.broadcast_to_admins({"event": "message_created", "data": message_payload}, admin_ids=admin_targets)
-    await manager.broadcast_to_admins({"event": "dialog_updated", "data": dialog_payload}, admin_ids=admin_targets)
-    await manager.broadcast_to_webchat(
-        bot_id=updated_dialog.bot_id,
-        session_id=updated_dialog.external_chat_id,
-        message={"event": "message_created", "data": message_payload},
-    )
-    await manager.broadcast_to_webchat(
-        bot_id=updated_dialog.bot_id,
-        session_id=updated_dialog.external_chat_id,
-        message={"event": "dialog_updated", "data": dialog_payload},
-    )
+async def _deliver_operator_message(
+    *,
+    dialog_id: int,
+    bot_id: int,
+    channel_type: ChannelType,
+    external_chat_id: str,
+    text: str,
+    event_name: str,
+    dialog_payload: dict,
+    message_payload: dict,
+    admin_ids: list[int] | None,
+) -> None:
+    """Send a stored Bitrix24 operator reply to the user and notify websocket clients."""
+
+    try:
+        sender = get_sender_instance(channel_type)
+        await sender.send_text(bot_id=bot_id, external_chat_id=external_chat_id, text=text)
+
+        await manager.broadcast_new_message(
+            dialog_payload=dialog_payload,
+            message_payload=message_payload,
+            admin_ids=admin_ids,
+        )
+    except Exception:
+        logger.exception(
+            "Failed to deliver Bitrix operator message",
+            extra={"dialog_id": dialog_id, "bot_id": bot_id, "event_name": event_name},
+        )
+        return
 
     logger.info(
         "Bitrix operator message delivered",
-        extra={"dialog_id": dialog.id, "bot_id": dialog.bot_id, "event_name": event_name},
+        extra={"dialog_id": dialog_id, "bot_id": bot_id, "event_name": event_name},
     )
-    return {"status": "ok"}
\ No newline at end of file
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 from datetime import datetime
+from typing import Any
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class BitrixConnectRequest(BaseModel):
@@ -34,6 +35,8 @@ class BitrixSettingsUpdateRequest(BaseModel):
 
 
 class BitrixEventPayload(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     event: str | None = None
-    data: dict | None = None
-    auth: dict | None = None
\ No newline at end of file
+    data: dict[str, Any] | None = None
+    auth: dict[str, Any] | None = None
\ No newline at end of file
@@ -4,16 +4,17 @@ import asyncio
 import base64
 import hashlib
 import hmac
-import json
 import logging
+import random
 import secrets
 import time
 from datetime import UTC, datetime, timedelta
+from functools import lru_cache
 from typing import Any
 from urllib.parse import urlencode, urlparse
 
 import httpx
-from sqlalchemy import select
+from sqlalchemy import bindparam, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
@@ -21,9 +22,18 @@ from app.database import async_session_factory
 from app.modules.channels.models import ChannelType
 from app.modules.dialogs.models import Dialog
 from app.modules.integrations.bitrix24.models import BitrixDialogLink, BitrixIntegration
+from app.utils import json_codec
 
 logger = logging.getLogger(__name__)
 
+_INTEGRATION_BY_BOT_STMT = select(BitrixIntegration).where(BitrixIntegration.bot_id == bindparam("bot_id"))
+_LINK_BY_DIALOG_STMT = select(BitrixDialogLink).where(BitrixDialogLink.dialog_id == bindparam("dialog_id"))
+_DIALOG_WITH_LINK_BY_ID_STMT = (
+    select(Dialog, BitrixDialogLink)
+    .outerjoin(BitrixDialogLink, BitrixDialogLink.dialog_id == Dialog.id)
+    .where(Dialog.id == bindparam("dialog_id"))
+)
+
 
 def utcnow_naive() -> datetime:
     return datetime.now(UTC).replace(tzinfo=None)
@@ -37,9 +47,65 @@ class BitrixRateLimitError(BitrixIntegrationError):
     pass
 
 
+_http_client: httpx.AsyncClient | None = None
+
+
+def get_bitrix_http_client() -> httpx.AsyncClient:
+    """Return the process-wide HTTP client so Bitrix24 calls reuse pooled connections."""
+
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=10.0,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+    return _http_client
+
+
+async def close_bitrix_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def _flatten_rest_params(value: Any, prefix: str) -> list[tuple[str, str]]:
+    """Flatten nested params into PHP-style ``key[sub][0]`` pairs, the form Bitrix24 REST decodes."""
+
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, (list, tuple)):
+        items = enumerate(value)
+    else:
+        return [(prefix, str(value))]
+    pairs: list[tuple[str, str]] = []
+    for key, item in items:
+        pairs.extend(_flatten_rest_params(item, f"{prefix}[{key}]" if prefix else str(key)))
+    return pairs
+
+
+@lru_cache(maxsize=1)
+def _state_hmac(secret: str) -> hmac.HMAC:
+    """Pre-keyed HMAC for OAuth state tokens; callers ``copy()`` it to skip re-deriving the key pads."""
+
+    return hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256)
+
+
+def _state_signature(raw: bytes) -> bytes:
+    mac = _state_hmac(settings.bitrix24_connect_state_secret).copy()
+    mac.update(raw)
+    return mac.digest()
+
+
 class Bitrix24Service:
     connector_name = "serviceai"
 
+    def __init__(self, http_client: httpx.AsyncClient | None = None) -> None:
+        self._http_client = http_client
+
+    def _client(self) -> httpx.AsyncClient:
+        return self._http_client or get_bitrix_http_client()
+
     def normalize_portal_url(self, portal_domain: str) -> str:
         cleaned = portal_domain.strip().lower()
         if not cleaned:
@@ -61,29 +127,32 @@ class Bitrix24Service:
     def _sign_state(self, payload: dict[str, Any]) -> str:
         if not settings.bitrix24_connect_state_secret:
             raise BitrixIntegrationError("Bitrix24 OAuth не настроен")
-        secret = settings.bitrix24_connect_state_secret.encode("utf-8")
-        raw = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8")
-        signature = hmac.new(secret, raw, hashlib.sha256).hexdigest()
-        packed = {"payload": payload, "sig": signature}
-        token = base64.urlsafe_b64encode(json.dumps(packed, separators=(",", ":")).encode("utf-8")).decode("utf-8")
-        return token
+        # The token is "<payload>.<signature>", both urlsafe base64; verification checks the exact
+        # payload bytes, so they are serialized only once and key order does not matter.
+        raw = json_codec.dumps_bytes(payload)
+        encoded_payload = base64.urlsafe_b64encode(raw).decode("ascii")
+        encoded_signature = base64.urlsafe_b64encode(_state_signature(raw)).decode("ascii")
+        return f"{encoded_payload}.{encoded_signature}"
 
     def _verify_state(self, token: str) -> dict[str, Any]:
         try:
-            raw = base64.urlsafe_b64decode(token.encode("utf-8")).decode("utf-8")
-            packed = json.loads(raw)
-            payload = packed["payload"]
-            signature = packed["sig"]
+            encoded_payload, encoded_signature = token.split(".", 1)
+            raw = base64.urlsafe_b64decode(encoded_payload.encode("ascii"))
+            signature = base64.urlsafe_b64decode(encoded_signature.encode("ascii"))
         except Exception as exc:  # noqa: BLE001
             raise BitrixIntegrationError("Неверный state OAuth") from exc
 
-        expected_sig = hmac.new(
-            settings.bitrix24_connect_state_secret.encode("utf-8"),
-            json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8"),
-            hashlib.sha256,
-        ).hexdigest()
+        # A signature of the wrong length cannot match; reject it before computing the HMAC.
+        if len(signature) != hashlib.sha256().digest_size or not hmac.compare_digest(
+            signature, _state_signature(raw)
+        ):
+            raise BitrixIntegrationError("Неверный state OAuth")
 
-        if not hmac.compare_digest(signature, expected_sig):
+        try:
+            payload = json_codec.loads(raw)
+        except ValueError as exc:
+            raise BitrixIntegrationError("Неверный state OAuth") from exc
+        if not isinstance(payload, dict):
             raise BitrixIntegrationError("Неверный state OAuth")
 
         issued_at = int(payload.get("ts", 0))
@@ -127,8 +196,7 @@ class Bitrix24Service:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(token_url, data=payload)
+            response = await self._client().post(token_url, data=payload)
         except (httpx.TimeoutException, httpx.RequestError) as exc:
             raise BitrixIntegrationError("Ошибка соединения с Bitrix24") from exc
 
@@ -137,7 +205,7 @@ class Bitrix24Service:
             raise BitrixIntegrationError("Нет прав доступа (scope)")
 
         try:
-            data = response.json()
+            data = json_codec.loads(response.content)
         except ValueError as exc:
             raise BitrixIntegrationError("Не удалось получить токен Bitrix24") from exc
 
@@ -160,8 +228,7 @@ class Bitrix24Service:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(token_url, data=payload)
+            response = await self._client().post(token_url, data=payload)
         except (httpx.TimeoutException, httpx.RequestError) as exc:
             raise BitrixIntegrationError("Ошибка соединения с Bitrix24") from exc
 
@@ -173,7 +240,7 @@ class Bitrix24Service:
             raise BitrixIntegrationError("Не удалось обновить токен")
 
         try:
-            data = response.json()
+            data = json_codec.loads(response.content)
         except ValueError as exc:
             raise BitrixIntegrationError("Не удалось обновить токен") from exc
 
@@ -185,7 +252,7 @@ class Bitrix24Service:
         integration.access_token = access_token
         integration.refresh_token = refresh_token
         expires_in = int(data.get("expires_in", 3600))
-        integration.expires_at = datetime.now(UTC).replace(tzinfo=None) + timedelta(seconds=expires_in - 30)
+        integration.expires_at = utcnow_naive() + timedelta(seconds=expires_in - 30)
         integration.scope = data.get("scope") or integration.scope
         integration.member_id = data.get("member_id") or integration.member_id
         integration.enabled = True
@@ -196,11 +263,18 @@ class Bitrix24Service:
         return integration
 
     async def get_integration(self, session: AsyncSession, bot_id: int) -> BitrixIntegration | None:
-        result = await session.execute(select(BitrixIntegration).where(BitrixIntegration.bot_id == bot_id))
+        result = await session.execute(_INTEGRATION_BY_BOT_STMT, {"bot_id": bot_id})
         return result.scalars().first()
 
     async def ensure_active_integration(self, session: AsyncSession, bot_id: int) -> BitrixIntegration | None:
         integration = await self.get_integration(session=session, bot_id=bot_id)
+        return await self.ensure_active(session=session, integration=integration)
+
+    async def ensure_active(
+        self, session: AsyncSession, integration: BitrixIntegration | None
+    ) -> BitrixIntegration | None:
+        """Like ensure_active_integration, for an integration the caller has already loaded."""
+
         if not integration or not integration.enabled:
             return None
 
@@ -223,40 +297,41 @@ class Bitrix24Service:
 
         endpoint = f"{active_integration.portal_url}/rest/{method_name}.json"
         payload = {**params, "auth": active_integration.access_token}
+        client = self._client()
+        # The encoded request is reused across retries; only a token refresh requires rebuilding it.
+        request = client.build_request("POST", endpoint, data=payload, headers={"Accept": "application/json"})
 
         for attempt in range(1, max_retries + 1):
             try:
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    response = await client.post(
-                        endpoint,
-                        data=payload,
-                        headers={"Accept": "application/json"},
-                    )
+                response = await client.send(request)
 
                 if response.status_code == 401 and attempt == 1:
                     active_integration = await self.refresh_access_token(session=session, integration=active_integration)
                     payload["auth"] = active_integration.access_token
+                    request = client.build_request(
+                        "POST", endpoint, data=payload, headers={"Accept": "application/json"}
+                    )
                     continue
 
                 if response.status_code == 429:
                     if attempt == max_retries:
                         raise BitrixRateLimitError("Превышен лимит Bitrix24 REST")
-                    await self._backoff(attempt)
+                    await self._backoff(attempt, response)
                     continue
 
                 try:
-                    data = response.json()
+                    data = json_codec.loads(response.content)
                 except ValueError as exc:
                     if attempt == max_retries:
                         raise BitrixIntegrationError("Ошибка Bitrix24 API") from exc
-                    await self._backoff(attempt)
+                    await self._backoff(attempt, response)
                     continue
 
                 error_code = str(data.get("error", ""))
                 if error_code in {"QUERY_LIMIT_EXCEEDED", "TOO_MANY_REQUESTS"}:
                     if attempt == max_retries:
                         raise BitrixRateLimitError("Превышен лимит Bitrix24 REST")
-                    await self._backoff(attempt)
+                    await self._backoff(attempt, response)
                     continue
 
                 if data.get("error"):
@@ -288,8 +363,42 @@ class Bitrix24Service:
 
         raise BitrixIntegrationError("Ошибка Bitrix24 API")
 
-    async def _backoff(self, attempt: int) -> None:
-        delay = min(2**attempt, 8)
+    async def call_rest_batch(
+        self,
+        *,
+        session: AsyncSession,
+        integration: BitrixIntegration,
+        commands: dict[str, tuple[str, dict[str, Any]]],
+    ) -> dict[str, Any]:
+        """Run several REST methods in one ``batch`` request and return their results by command name."""
+
+        params: dict[str, Any] = {"halt": 0}
+        for name, (method_name, method_params) in commands.items():
+            params[f"cmd[{name}]"] = f"{method_name}?{urlencode(_flatten_rest_params(method_params, ''))}"
+
+        response = await self.call_rest(session=session, integration=integration, method_name="batch", params=params)
+        batch_result = response.get("result") or {}
+        errors = batch_result.get("result_error") or {}
+        if errors:
+            logger.warning(
+                "Bitrix REST batch returned errors",
+                extra={"commands": sorted(errors), "bot_id": integration.bot_id},
+            )
+            error = next(iter(errors.values()))
+            description = error.get("error_description") if isinstance(error, dict) else None
+            raise BitrixIntegrationError(description or "Ошибка Bitrix24 API")
+        return batch_result.get("result") or {}
+
+    async def _backoff(self, attempt: int, response: httpx.Response | None = None) -> None:
+        base = min(2**attempt, 8)
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        try:
+            delay = min(float(retry_after), 60.0) if retry_after else None
+        except ValueError:
+            delay = None
+        if delay is None:
+            # Equal jitter keeps concurrent callers that hit the same limit from retrying in lockstep.
+            delay = random.uniform(base / 2, base)
         await asyncio.sleep(delay)
 
     def resolve_bitrix_connector(self, channel_type: ChannelType) -> str | None:
@@ -312,15 +421,19 @@ class Bitrix24Service:
         return self._verify_state(state)
 
     async def get_or_create_dialog_link(self, session: AsyncSession, dialog: Dialog) -> BitrixDialogLink:
-        result = await session.execute(select(BitrixDialogLink).where(BitrixDialogLink.dialog_id == dialog.id))
+        result = await session.execute(_LINK_BY_DIALOG_STMT, {"dialog_id": dialog.id})
         link = result.scalars().first()
         if link:
             return link
 
+        return await self._add_dialog_link(session=session, dialog=dialog)
+
+    @staticmethod
+    async def _add_dialog_link(session: AsyncSession, dialog: Dialog) -> BitrixDialogLink:
+        # Flushed only; the caller commits it together with the Bitrix ids it stores on the link.
         link = BitrixDialogLink(dialog_id=dialog.id, bot_id=dialog.bot_id)
         session.add(link)
-        await session.commit()
-        await session.refresh(link)
+        await session.flush()
         return link
 
     async def send_user_message_to_openline(
@@ -330,8 +443,10 @@ class Bitrix24Service:
         integration: BitrixIntegration,
         dialog: Dialog,
         text: str,
+        link: BitrixDialogLink | None = None,
     ) -> BitrixDialogLink:
-        link = await self.get_or_create_dialog_link(session=session, dialog=dialog)
+        if link is None:
+            link = await self.get_or_create_dialog_link(session=session, dialog=dialog)
 
         if not integration.openline_id:
             raise BitrixIntegrationError(
@@ -365,6 +480,26 @@ class Bitrix24Service:
             ],
         }
 
+        if link.bitrix_chat_id:
+            # The Bitrix chat is already known, so the delivery status does not depend on the send
+            # result and both calls can share one batch round trip.
+            await self.call_rest_batch(
+                session=session,
+                integration=integration,
+                commands={
+                    "send": ("imconnector.send.messages", message_payload),
+                    "deliver": (
+                        "imconnector.send.status.delivery",
+                        {
+                            "CONNECTOR": connector,
+                            "LINE": integration.openline_id,
+                            "MESSAGES": [{"im": {"chat_id": link.bitrix_chat_id}}],
+                        },
+                    ),
+                },
+            )
+            return link
+
         response = await self.call_rest(
             session=session,
             integration=integration,
@@ -376,9 +511,8 @@ class Bitrix24Service:
         chat_id = result.get("chat_id") or result.get("CHAT_ID")
         if chat_id:
             link.bitrix_chat_id = str(chat_id)
-            session.add(link)
-            await session.commit()
-            await session.refresh(link)
+        # Persist the link and its chat id before the delivery call so a failure there cannot lose them.
+        await session.commit()
 
         await self.call_rest(
             session=session,
@@ -399,8 +533,10 @@ class Bitrix24Service:
         session: AsyncSession,
         integration: BitrixIntegration,
         dialog: Dialog,
+        link: BitrixDialogLink | None = None,
     ) -> BitrixDialogLink:
-        link = await self.get_or_create_dialog_link(session=session, dialog=dialog)
+        if link is None:
+            link = await self.get_or_create_dialog_link(session=session, dialog=dialog)
         if not link.bitrix_chat_id:
             raise BitrixIntegrationError("Диалог ещё не создан в Bitrix24")
 
@@ -416,9 +552,7 @@ class Bitrix24Service:
             raise BitrixIntegrationError("Не удалось создать лид")
 
         link.bitrix_lead_id = int(lead_id)
-        session.add(link)
         await session.commit()
-        await session.refresh(link)
         return link
 
     async def sync_incoming_user_message(
@@ -438,29 +572,35 @@ class Bitrix24Service:
                 if integration is None:
                     return
 
-                result = await session.execute(select(Dialog).where(Dialog.id == dialog_id))
-                dialog = result.scalars().first()
-                if dialog is None:
+                # The dialog and its link come back together, and the link is handed to both calls below.
+                row = (await session.execute(_DIALOG_WITH_LINK_BY_ID_STMT, {"dialog_id": dialog_id})).first()
+                if row is None:
                     return
+                dialog, link = row
+                if link is None:
+                    link = await self._add_dialog_link(session=session, dialog=dialog)
 
                 link = await self.send_user_message_to_openline(
                     session=session,
                     integration=integration,
                     dialog=dialog,
                     text=text,
+                    link=link,
                 )
                 if dialog_created and integration.auto_create_lead_on_first_message and not link.bitrix_lead_id:
                     await self.create_lead_for_dialog(
                         session=session,
                         integration=integration,
                         dialog=dialog,
+                        link=link,
                     )
 
         timeout_seconds = settings.bitrix24_background_sync_timeout_seconds
 
         try:
-            await asyncio.wait_for(_sync(), timeout=timeout_seconds)
-        except asyncio.TimeoutError:
+            async with asyncio.timeout(timeout_seconds):
+                await _sync()
+        except TimeoutError:
             logger.warning(
                 "Bitrix24 integration timeout",
                 extra={"bot_id": bot_id, "dialog_id": dialog_id, "timeout_seconds": timeout_seconds},
@@ -479,3 +619,10 @@ class Bitrix24Service:
                 extra={"bot_id": bot_id, "dialog_id": dialog_id, "error": str(exc)},
                 exc_info=True,
             )
+
+
+@lru_cache(maxsize=1)
+def get_bitrix24_service() -> Bitrix24Service:
+    """Shared service instance for request dependencies and background syncs."""
+
+    return Bitrix24Service()
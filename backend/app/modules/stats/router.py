@@ -1,9 +1,6 @@
 """Statistics router implementation."""
 from __future__ import annotations
 
-from collections import defaultdict
-from datetime import datetime
-
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -20,10 +17,9 @@ from app.security.auth import get_current_user
 router = APIRouter(prefix="/bots/{bot_id}/stats", tags=["stats"])
 
 
-def _calculate_average(values: list[float]) -> float | None:
-    if not values:
-        return None
-    return sum(values) / len(values)
+def _as_seconds(value: object) -> float | None:
+    # AVG over EXTRACT(EPOCH ...) comes back as a Decimal on PostgreSQL.
+    return float(value) if value is not None else None
 
 
 @router.get("/summary", response_model=StatsSummary)
@@ -33,56 +29,57 @@ async def get_summary(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_db_session),
 ) -> StatsSummary:
-    total_dialogs = await session.scalar(
-        select(func.count(Dialog.id)).where(Dialog.bot_id == accessible_bot.id)
-    )
-    active_dialogs = await session.scalar(
-        select(func.count(Dialog.id)).where(Dialog.bot_id == accessible_bot.id, Dialog.closed.is_(False))
-    )
-
-    status_counts: dict[str, int] = defaultdict(int)
-    status_rows = await session.execute(
-        select(Dialog.status, func.count(Dialog.id)).where(Dialog.bot_id == accessible_bot.id).group_by(Dialog.status)
-    )
-    for status, count in status_rows.all():
-        status_value = status.value if isinstance(status, DialogStatus) else str(status)
-        status_counts[status_value] = count
-
-    dialog_status_breakdown = DialogStatusBreakdown(
-        auto=status_counts.get(DialogStatus.AUTO.value, 0),
-        wait_operator=status_counts.get(DialogStatus.WAIT_OPERATOR.value, 0),
-        wait_user=status_counts.get(DialogStatus.WAIT_USER.value, 0),
+    # Counts and timing averages are computed by the database in a single round trip.
+    dialog_counts = (
+        select(
+            func.count(Dialog.id).label("total"),
+            func.count(Dialog.id).filter(Dialog.closed.is_(False)).label("active"),
+            func.count(Dialog.id).filter(Dialog.status == DialogStatus.AUTO).label("auto"),
+            func.count(Dialog.id).filter(Dialog.status == DialogStatus.WAIT_OPERATOR).label("wait_operator"),
+            func.count(Dialog.id).filter(Dialog.status == DialogStatus.WAIT_USER).label("wait_user"),
+        )
+        .where(Dialog.bot_id == accessible_bot.id)
+        .cte("dialog_counts")
     )
-
-    message_stats_rows = await session.execute(
+    message_bounds = (
         select(
-            DialogMessage.dialog_id,
-            func.min(DialogMessage.created_at),
-            func.max(DialogMessage.created_at),
-            Dialog.created_at,
+            DialogMessage.dialog_id.label("dialog_id"),
+            func.min(DialogMessage.created_at).label("first_message_at"),
+            func.max(DialogMessage.created_at).label("last_message_at"),
         )
         .join(Dialog, DialogMessage.dialog_id == Dialog.id)
         .where(Dialog.bot_id == accessible_bot.id)
-        .group_by(DialogMessage.dialog_id, Dialog.created_at)
+        .group_by(DialogMessage.dialog_id)
+        .cte("message_bounds")
+    )
+    timing = (
+        select(
+            func.avg(
+                func.extract("epoch", message_bounds.c.last_message_at - message_bounds.c.first_message_at)
+            ).label("average_dialog_duration_seconds"),
+            func.avg(
+                func.extract("epoch", message_bounds.c.first_message_at - Dialog.created_at)
+            ).label("average_time_to_first_message_seconds"),
+        )
+        .select_from(message_bounds.join(Dialog, Dialog.id == message_bounds.c.dialog_id))
+        .cte("timing")
     )
 
-    dialog_durations: list[float] = []
-    first_message_delays: list[float] = []
-    for _dialog_id, first_message_at, last_message_at, dialog_created_at in message_stats_rows.all():
-        if isinstance(first_message_at, datetime) and isinstance(last_message_at, datetime):
-            dialog_durations.append((last_message_at - first_message_at).total_seconds())
-        if isinstance(first_message_at, datetime) and isinstance(dialog_created_at, datetime):
-            first_message_delays.append((first_message_at - dialog_created_at).total_seconds())
+    row = (await session.execute(select(dialog_counts, timing))).one()
 
     summary = StatsSummary(
         dialogs={
-            "total": total_dialogs or 0,
-            "active": active_dialogs or 0,
-            "by_status": dialog_status_breakdown,
+            "total": row.total or 0,
+            "active": row.active or 0,
+            "by_status": DialogStatusBreakdown(
+                auto=row.auto or 0,
+                wait_operator=row.wait_operator or 0,
+                wait_user=row.wait_user or 0,
+            ),
         },
         timing={
-            "average_dialog_duration_seconds": _calculate_average(dialog_durations),
-            "average_time_to_first_message_seconds": _calculate_average(first_message_delays),
+            "average_dialog_duration_seconds": _as_seconds(row.average_dialog_duration_seconds),
+            "average_time_to_first_message_seconds": _as_seconds(row.average_time_to_first_message_seconds),
         },
     )
     return summary
@@ -98,8 +95,10 @@ async def get_admins(
     bot = await session.scalar(
         select(Bot)
         .options(
-            selectinload(Bot.account).selectinload(Account.owner),
-            selectinload(Bot.account).selectinload(Account.operators),
+            selectinload(Bot.account).options(
+                selectinload(Account.owner),
+                selectinload(Account.operators),
+            )
         )
         .where(Bot.id == accessible_bot.id)
     )
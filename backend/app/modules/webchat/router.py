@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 import json
-import uuid
+import secrets
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException, Request, status
@@ -83,6 +83,7 @@ async def init_webchat(
             BotChannel.channel_type == ChannelType.WEBCHAT,
             BotChannel.is_active.is_(True),
         )
+        .limit(1)
     )
     result = await session.execute(stmt)
     row = result.first()
@@ -98,7 +99,7 @@ async def init_webchat(
     except (TypeError, ValueError):
         border_width = 1
 
-    session_id = str(uuid.uuid4())
+    session_id = secrets.token_urlsafe(16)
     ws_url = _resolve_ws_url(request, payload.bot_id, session_id)
 
     return WebchatInitOut(
@@ -2,7 +2,10 @@
 
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.config import settings
+
+# bcrypt stores its salt and cost in each hash, so raising the rounds only affects new hashes.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.password_bcrypt_rounds)
 
 
 def hash_password(password: str) -> str:
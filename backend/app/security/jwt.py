@@ -1,6 +1,8 @@
 """JWT utilities."""
 
-from datetime import datetime, timedelta
+import re
+import time
+from functools import lru_cache
 from typing import Any, Dict
 
 import jwt
@@ -36,7 +38,7 @@ def create_access_token(subject: str | int, expires_minutes: int | None = None)
     return _create_token(
         subject=subject,
         secret_key=settings.jwt_secret_key,
-        expires_delta=timedelta(minutes=expires_minutes),
+        expires_in_seconds=expires_minutes * 60,
         token_type=TokenType.ACCESS,
     )
 
@@ -47,7 +49,7 @@ def create_refresh_token(subject: str | int, expires_days: int | None = None) ->
     return _create_token(
         subject=subject,
         secret_key=settings.jwt_refresh_secret_key,
-        expires_delta=timedelta(days=expires_days),
+        expires_in_seconds=expires_days * 86400,
         token_type=TokenType.REFRESH,
     )
 
@@ -69,28 +71,48 @@ def decode_refresh_token(token: str) -> Dict[str, Any]:
 
 
 def _create_token(
-    subject: str | int, secret_key: str, expires_delta: timedelta, token_type: TokenType
+    subject: str | int, secret_key: str, expires_in_seconds: int, token_type: TokenType
 ) -> str:
-    now = datetime.utcnow()
+    # iat/exp are plain epoch seconds in the token, so skip building datetimes for PyJWT to convert back.
+    now = int(time.time())
     payload: Dict[str, Any] = {
         "sub": str(subject),
-        "type": token_type.value,
+        "type": token_type,
         "iat": now,
-        "exp": now + expires_delta,
+        "exp": now + expires_in_seconds,
     }
     return jwt.encode(payload, secret_key, algorithm=settings.jwt_algorithm)
 
 
+# header.payload.signature, each a non-empty base64url segment.
+_TOKEN_SHAPE_RE = re.compile(r"[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+")
+
+
+@lru_cache(maxsize=4096)
+def _verify_token(token: str, secret_key: str, algorithm: str) -> Dict[str, Any]:
+    # Clients replay the same token on every request; a verified payload only needs its exp re-checked.
+    # Failures raise and are therefore never cached.
+    return jwt.decode(token, secret_key, algorithms=[algorithm])
+
+
 def _decode_token(token: str, secret_key: str, expected_type: TokenType) -> Dict[str, Any]:
+    # Reject malformed strings before any base64 decoding or HMAC work.
+    if not _TOKEN_SHAPE_RE.fullmatch(token):
+        raise TokenDecodeError("Invalid token")
+
     try:
-        payload = jwt.decode(token, secret_key, algorithms=[settings.jwt_algorithm])
+        payload = _verify_token(token, secret_key, settings.jwt_algorithm)
     except jwt.ExpiredSignatureError as exc:  # pragma: no cover
         raise TokenDecodeError("Token has expired") from exc
     except jwt.InvalidTokenError as exc:  # pragma: no cover
         raise TokenDecodeError("Invalid token") from exc
 
-    token_type = payload.get("type")
-    if token_type != expected_type.value:
+    expires_at = payload.get("exp")
+    if expires_at is not None and expires_at <= time.time():
+        raise TokenDecodeError("Token has expired")
+
+    # TokenType members are str subclasses, so they compare and serialize as their plain values.
+    if payload.get("type") != expected_type:
         raise TokenDecodeError("Token type mismatch")
 
-    return payload
+    return dict(payload)
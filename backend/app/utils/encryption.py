@@ -2,23 +2,42 @@
 
 from __future__ import annotations
 
+import binascii
 import hashlib
-import json
-from base64 import urlsafe_b64encode
+import os
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import lru_cache
 from typing import Any, Dict
 
+from cryptography.exceptions import InvalidTag
 from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 from app.config import settings
+from app.utils import json_codec
 
+# Configs are written as "v2:" + base64(nonce + AES-GCM ciphertext); values without the prefix are
+# legacy Fernet tokens and are still decrypted.
+_AESGCM_PREFIX = "v2:"
+_AESGCM_NONCE_SIZE = 12
 
-def _get_cipher() -> Fernet:
-    """Return a Fernet cipher instance using the configured secret key."""
 
+def _configured_key() -> str:
     raw_key = settings.channel_config_secret_key
     if not raw_key:
         raise ValueError("channel_config_secret_key is not configured")
+    return raw_key
+
+
+def _get_cipher() -> Fernet:
+    """Return a Fernet cipher instance using the configured secret key."""
+
+    return _cipher_for_key(_configured_key())
 
+
+@lru_cache(maxsize=1)
+def _cipher_for_key(raw_key: str) -> Fernet:
+    # Keyed on the secret itself, so a changed setting builds a new cipher instead of reusing a stale one.
     key_bytes = raw_key.encode()
     if len(key_bytes) != 44:
         key_bytes = urlsafe_b64encode(hashlib.sha256(key_bytes).digest())
@@ -26,20 +45,32 @@ def _get_cipher() -> Fernet:
     return Fernet(key_bytes)
 
 
+def _get_aead() -> AESGCM:
+    """Return the AES-GCM cipher used for newly encrypted configs."""
+
+    return _aead_for_key(_configured_key())
+
+
+@lru_cache(maxsize=1)
+def _aead_for_key(raw_key: str) -> AESGCM:
+    return AESGCM(hashlib.sha256(raw_key.encode()).digest())
+
+
 def encrypt_config(config: Dict[str, Any]) -> str:
     """
     Encrypt a channel configuration dictionary.
 
-    The returned value is a URL-safe base64 string suitable for storage in JSON
-    columns. If the input is falsy, it will be returned as-is.
+    The returned value is a versioned, URL-safe base64 string suitable for
+    storage in JSON columns. If the input is falsy, it will be returned as-is.
     """
 
     if config is None:
         return config
 
-    cipher = _get_cipher()
-    serialized = json.dumps(config).encode()
-    return cipher.encrypt(serialized).decode()
+    serialized = json_codec.dumps_bytes(config)
+    nonce = os.urandom(_AESGCM_NONCE_SIZE)
+    ciphertext = _get_aead().encrypt(nonce, serialized, None)
+    return _AESGCM_PREFIX + urlsafe_b64encode(nonce + ciphertext).decode()
 
 
 def decrypt_config(data: Any) -> Dict[str, Any]:
@@ -59,10 +90,18 @@ def decrypt_config(data: Any) -> Dict[str, Any]:
     if not isinstance(data, str):
         raise ValueError("Unsupported config payload for decryption")
 
-    cipher = _get_cipher()
-    try:
-        decrypted = cipher.decrypt(data.encode())
-    except InvalidToken as exc:  # pragma: no cover - safety check
-        raise ValueError("Unable to decrypt channel configuration") from exc
-
-    return json.loads(decrypted.decode())
+    if data.startswith(_AESGCM_PREFIX):
+        aead = _get_aead()
+        try:
+            blob = urlsafe_b64decode(data[len(_AESGCM_PREFIX) :].encode())
+            decrypted = aead.decrypt(blob[:_AESGCM_NONCE_SIZE], blob[_AESGCM_NONCE_SIZE:], None)
+        except (InvalidTag, binascii.Error, ValueError) as exc:
+            raise ValueError("Unable to decrypt channel configuration") from exc
+    else:
+        cipher = _get_cipher()
+        try:
+            decrypted = cipher.decrypt(data.encode())
+        except InvalidToken as exc:  # pragma: no cover - safety check
+            raise ValueError("Unable to decrypt channel configuration") from exc
+
+    return json_codec.loads(decrypted)
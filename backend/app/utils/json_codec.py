@@ -0,0 +1,58 @@
+"""Fast JSON encoding helpers.
+
+orjson is an optional accelerator: it is used when installed, and the standard
+library is the fallback. Both paths write compact UTF-8 JSON, coerce non-string
+dict keys to strings and encode datetimes, dates, times and UUIDs as strings, so
+the output does not depend on which backend is active.
+"""
+
+from __future__ import annotations
+
+import json
+from datetime import date, datetime, time
+from typing import Any
+from uuid import UUID
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+ORJSON_AVAILABLE = orjson is not None
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def _default(value: Any) -> Any:
+    """Encode the extra types orjson supports natively for the stdlib encoder."""
+
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(value: Any) -> bytes:
+    """Serialize a value to compact UTF-8 JSON bytes."""
+
+    if orjson is not None:
+        return orjson.dumps(value, option=_ORJSON_OPTIONS)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+
+def dumps(value: Any) -> str:
+    """Serialize a value to a compact JSON string."""
+
+    if orjson is not None:
+        return orjson.dumps(value, option=_ORJSON_OPTIONS).decode()
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_default)
+
+
+def loads(data: str | bytes | bytearray | memoryview) -> Any:
+    """Deserialize JSON from a string or bytes."""
+
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)